@@ -1,91 +1,222 @@
+import eventlet
+eventlet.monkey_patch()  # Must run before anything imports socket/select/threading
+
 import os
 import pty
-import select
 import subprocess
 import struct
 import fcntl
 import termios
 import signal
+import sys
 import threading
-from flask import Flask, render_template, jsonify, request
+import time
+from eventlet import hubs
+from eventlet.event import Event
+from flask import Flask, Response, render_template, jsonify, request
 from flask_socketio import SocketIO, emit
 import database
+import tmux_control
+
+# Un-patched os for the PTY and wakeup fds. They are already non-blocking, and
+# eventlet's green read/write always park on the hub first, which collides
+# when several input events write to one PTY at once.
+raw_os = eventlet.patcher.original('os')
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tmux-workspace-secret'
-socketio = SocketIO(app, async_mode='threading', cors_allowed_origins='*')
-
-# Track active PTY sessions: {sid: {termId: {'fd': fd, 'pid': pid, ...}}}
-terminals = {}
-
-# --- HTTP Routes ---
-
-@app.route('/')
-def index():
-    return render_template('index.html')
+socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins='*')
+
+# Track active PTY sessions: {sid: {termId: {'fd': fd, 'pid': pid, ...}}},
+# sharded by sid so handlers for different clients don't share a lock
+TERMINAL_SHARDS = 16  # must be a power of two
+_shards = [{} for _ in range(TERMINAL_SHARDS)]
+_shard_locks = [threading.Lock() for _ in range(TERMINAL_SHARDS)]
+
+# PTY output is coalesced into frames of at most MAX_BATCH bytes. One read
+# can drain the whole kernel-side PTY buffer (~64 KB on Linux).
+MAX_BATCH = 65536
+SMALL_BATCH = 4096
+FLUSH_DELAY = 0.002  # seconds to wait for more output before a small flush
+# A frame under SMALL_BATCH waits here until FLUSH_DELAY after its first read:
+# fd -> [sid, termId, buf, n, flush_at]
+_pending_output = {}
+
+# Keystrokes are coalesced for up to INPUT_FLUSH_DELAY or INPUT_FLUSH_SIZE bytes
+INPUT_FLUSH_SIZE = 4096
+INPUT_FLUSH_DELAY = 0.002
+
+# Seconds a closed terminal's child gets after SIGTERM before SIGKILL
+KILL_GRACE = 0.2
+
+# Per-thread free-list of MAX_BATCH-sized output buffers
+BUF_POOL_SIZE = 4
+_buf_pool = threading.local()
+
+# One reader task multiplexes every PTY fd: {fd: (sid, termId)}. Each fd is
+# registered once as a persistent reader on eventlet's hub (epoll/kqueue),
+# whose callback only records it in _ready_fds and wakes the task. The
+# patched selectors module can't be used for this: its select() adds and
+# removes a hub listener for every registered fd on each call.
+_fd_to_sid = {}
+_hub_listeners = {}  # fd -> hub listener
+_ready_fds = set()
+_ready_event = Event()
+_reader_started = False
+_reader_lock = threading.Lock()
+
+# Optional core for the server (Linux only), e.g. READER_CPU=0, applied at
+# startup when run as a script. Under eventlet the reader and every handler
+# share one OS thread, so this pins all of them. Spawned shells get the
+# original mask back.
+READER_CPU = os.environ.get('READER_CPU')
+_HAS_AFFINITY = hasattr(os, 'sched_setaffinity')
+_default_cpus = os.sched_getaffinity(0) if _HAS_AFFINITY else None
+_pinned = False
+
+# Start shells with posix_spawn (vfork+exec on glibc) rather than pty.fork(),
+# which copies the whole server's page tables. It can't restore the CPU mask,
+# so a pinned server uses fork instead.
+USE_POSIX_SPAWN = hasattr(os, 'posix_spawnp') and sys.platform.startswith('linux')
+
+# --- Tmux Queries ---
+
+# Tab-separated formats: ':' is legal in session and window names
+SESSIONS_FORMAT = '#{session_name}\t#{session_windows}\t#{session_attached}'
+WINDOWS_FORMAT = '#{window_index}\t#{window_name}'
+
+# Argument tuples built once at import instead of per request
+LIST_SESSIONS = ('list-sessions', '-F', SESSIONS_FORMAT)
+LIST_WINDOWS = ('list-windows', '-F', WINDOWS_FORMAT, '-t')  # + session
+
+# Minimal environment for the fallback tmux exec: just enough to find the
+# binary, the server socket and a UTF-8 locale
+TMUX_ENV = {k: os.environ[k] for k in
+            ('PATH', 'TMUX', 'TMUX_TMPDIR', 'LANG', 'LC_ALL', 'LC_CTYPE')
+            if k in os.environ}
+
+# Short-lived cache so polling clients don't fork tmux on every request:
+# {key: (value, expires_at)}
+TMUX_CACHE_TTL = 0.5
+_tmux_cache = {}
+_tmux_cache_lock = threading.Lock()
+
+def cached_tmux_query(key, query):
+    """Return query(), reusing a successful result for TMUX_CACHE_TTL seconds."""
+    entry = _tmux_cache.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+
+    # Serialize misses so concurrent requests share one tmux call
+    with _tmux_cache_lock:
+        entry = _tmux_cache.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        value = query()
+        if value is not None:
+            _tmux_cache[key] = (value, time.monotonic() + TMUX_CACHE_TTL)
+        return value
+
+def invalidate_tmux_cache():
+    """Drop cached tmux results, e.g. after a terminal may have created a session."""
+    _tmux_cache.clear()
+
+def tmux_lines(args):
+    """Run a tmux command and return its output lines (bytes), or None on failure.
+
+    Uses the persistent control-mode client, falling back to running tmux
+    directly if the client can't be started or has died.
+    """
+    try:
+        return tmux_control.run(args)
+    except OSError as e:
+        print(f"tmux control client unavailable: {e}")
 
-@app.route('/api/sessions')
-def get_sessions():
-    """List all tmux sessions."""
     try:
-        result = subprocess.run(
-            ['tmux', 'list-sessions', '-F', '#{session_name}:#{session_windows}:#{session_attached}'],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.returncode != 0:
-            print(f"tmux list-sessions failed: {result.stderr}")
-            return jsonify([])
+        result = subprocess.run(('tmux',) + args, capture_output=True,
+                                timeout=5, env=TMUX_ENV)
+    except subprocess.TimeoutExpired:
+        print(f"tmux {args[0]} timed out")
+        return None
+    if result.returncode != 0:
+        print(f"tmux {args[0]} failed: {result.stderr.decode(errors='replace')}")
+        return None
+    return result.stdout.splitlines()
+
+def query_sessions():
+    """List tmux sessions. Returns None on failure."""
+    try:
+        lines = tmux_lines(LIST_SESSIONS)
+        if lines is None:
+            return None
 
+        # Parse raw bytes; only the name needs decoding (int() takes bytes)
         sessions = []
-        for line in result.stdout.strip().split('\n'):
+        append = sessions.append
+        for line in lines:
             if not line:
                 continue
-            parts = line.split(':')
-            if len(parts) >= 3:
-                sessions.append({
-                    'name': parts[0],
-                    'windows': int(parts[1]),
-                    'attached': parts[2] == '1'
-                })
-        return jsonify(sessions)
-    except subprocess.TimeoutExpired:
-        print("tmux list-sessions timed out")
-        return jsonify([])
+            name, _, rest = line.partition(b'\t')
+            name = name.decode(errors='replace')
+            if name == tmux_control.CONTROL_SESSION:
+                continue
+            windows, _, attached = rest.partition(b'\t')
+            append({
+                'name': name,
+                'windows': int(windows),
+                'attached': attached == b'1'
+            })
+        return sessions
     except Exception as e:
         print(f"Error listing sessions: {e}")
-        return jsonify([])
+        return None
 
-@app.route('/api/sessions/<session>/windows')
-def get_windows(session):
-    """List windows in a tmux session."""
+def query_windows(session):
+    """List windows in a tmux session. Returns None on failure."""
     try:
-        result = subprocess.run(
-            ['tmux', 'list-windows', '-t', session, '-F', '#{window_index}:#{window_name}'],
-            capture_output=True, text=True
-        )
-        if result.returncode != 0:
-            return jsonify([])
+        lines = tmux_lines(LIST_WINDOWS + (session,))
+        if lines is None:
+            return None
 
         windows = []
-        for line in result.stdout.strip().split('\n'):
+        append = windows.append
+        for line in lines:
             if not line:
                 continue
-            parts = line.split(':', 1)
-            if len(parts) >= 2:
-                windows.append({
-                    'index': int(parts[0]),
-                    'name': parts[1]
-                })
-        return jsonify(windows)
+            index, _, name = line.partition(b'\t')
+            append({
+                'index': int(index),
+                'name': name.decode(errors='replace')
+            })
+        return windows
     except Exception as e:
         print(f"Error listing windows: {e}")
-        return jsonify([])
+        return None
+
+# --- HTTP Routes ---
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+@app.route('/api/sessions')
+def get_sessions():
+    """List all tmux sessions."""
+    sessions = cached_tmux_query(('sessions',), query_sessions)
+    return jsonify(sessions or [])
+
+@app.route('/api/sessions/<session>/windows')
+def get_windows(session):
+    """List windows in a tmux session."""
+    windows = cached_tmux_query(('windows', session), lambda: query_windows(session))
+    return jsonify(windows or [])
 
 @app.route('/api/layout', methods=['GET'])
 def get_layout():
     """Get saved layout from database."""
-    layout = database.get_layout()
-    return jsonify(layout or {})
+    # Stored JSON is already serialized; send it without a decode/encode pass
+    raw = database.get_layout_raw()
+    return Response(raw or '{}', mimetype='application/json')
 
 @app.route('/api/layout', methods=['POST'])
 def save_layout():
@@ -127,42 +258,39 @@ def on_open_terminal(data):
     # Clean up existing terminal with same termId
     cleanup_terminal(sid, term_id)
 
-    # Initialize sid dict if needed
-    if sid not in terminals:
-        terminals[sid] = {}
+    # A tmux attach may create or change sessions
+    invalidate_tmux_cache()
 
     try:
-        # Create PTY
-        pid, fd = pty.fork()
-
-        if pid == 0:
-            # Child process
-            os.environ['TERM'] = 'xterm-256color'
-            if terminal_type == 'tmux' and session:
-                # Use -d to detach other clients first, preventing "sessions should be nested" issues
-                os.execlp('tmux', 'tmux', 'attach-session', '-t', f'{session}:{window}')
-            else:
-                # Spawn bash
-                shell = os.environ.get('SHELL', '/bin/bash')
-                os.execlp(shell, shell, '-l')  # Login shell for proper env
+        if terminal_type == 'tmux' and session:
+            # Use -d to detach other clients first, preventing "sessions should be nested" issues
+            argv = ['tmux', 'attach-session', '-t', f'{session}:{window}']
         else:
-            # Parent process
-            # Set non-blocking
-            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
-
-            terminals[sid][term_id] = {
-                'fd': fd,
-                'pid': pid,
-                'type': terminal_type,
-                'session': session,
-                'window': window
-            }
-
-            # Start reading from PTY
-            socketio.start_background_task(read_pty, sid, term_id, fd)
-            emit('terminal_ready', {'status': 'ok', 'termId': term_id})
-            print(f"Terminal ready: sid={sid}, termId={term_id}")
+            # Spawn bash
+            shell = os.environ.get('SHELL', '/bin/bash')
+            argv = [shell, '-l']  # Login shell for proper env
+
+        # Create PTY
+        pid, fd = spawn_pty(argv)
+        # Set non-blocking
+        os.set_blocking(fd, False)
+
+        put_term(sid, term_id, {
+            'fd': fd,
+            'pid': pid,
+            'type': terminal_type,
+            'session': session,
+            'window': window,
+            'geom': None,  # last (rows, cols) applied with TIOCSWINSZ
+            'in_chunks': [],  # pending input, flushed with one writev()
+            'in_size': 0,
+            'in_timer': False
+        })
+
+        # Start reading from PTY
+        watch_pty(sid, term_id, fd)
+        emit('terminal_ready', {'status': 'ok', 'termId': term_id})
+        print(f"Terminal ready: sid={sid}, termId={term_id}")
 
     except Exception as e:
         print(f"Error opening terminal: {e}")
@@ -175,14 +303,11 @@ def on_terminal_input(data):
     term_id = data.get('termId', 'default') if isinstance(data, dict) else 'default'
     input_data = data.get('data', data) if isinstance(data, dict) else data
 
-    if sid not in terminals or term_id not in terminals[sid]:
+    terminal = get_term(sid, term_id)
+    if terminal is None:
         return
 
-    fd = terminals[sid][term_id]['fd']
-    try:
-        os.write(fd, input_data.encode('utf-8'))
-    except Exception as e:
-        print(f"Error writing to PTY: {e}")
+    queue_input(terminal, input_data.encode('utf-8'))
 
 @socketio.on('terminal_resize')
 def on_terminal_resize(data):
@@ -190,78 +315,345 @@ def on_terminal_resize(data):
     sid = request.sid
     term_id = data.get('termId', 'default')
 
-    if sid not in terminals or term_id not in terminals[sid]:
+    terminal = get_term(sid, term_id)
+    if terminal is None:
         return
 
-    fd = terminals[sid][term_id]['fd']
+    fd = terminal['fd']
     rows = data.get('rows', 24)
     cols = data.get('cols', 80)
 
+    # xterm.js re-sends the same size on focus/layout ticks; each ioctl
+    # would SIGWINCH the shell or tmux into a full redraw
+    if terminal['geom'] == (rows, cols):
+        return
+
     try:
         winsize = struct.pack('HHHH', rows, cols, 0, 0)
         fcntl.ioctl(fd, termios.TIOCSWINSZ, winsize)
+        terminal['geom'] = (rows, cols)
     except Exception as e:
         print(f"Error resizing PTY: {e}")
 
-def read_pty(sid, term_id, fd):
-    """Background task to read from PTY and send to client."""
-    while sid in terminals and term_id in terminals[sid] and terminals[sid][term_id]['fd'] == fd:
-        try:
-            ready, _, _ = select.select([fd], [], [], 0.1)
-            if ready:
-                try:
-                    data = os.read(fd, 4096)
-                    if data:
-                        socketio.emit('terminal_output', {
-                            'termId': term_id,
-                            'data': data.decode('utf-8', errors='replace')
-                        }, to=sid)
-                    else:
-                        # EOF
-                        break
-                except OSError:
-                    break
-        except Exception as e:
-            print(f"Error reading from PTY: {e}")
-            break
-
-    # Terminal closed
-    socketio.emit('terminal_closed', {'termId': term_id}, to=sid)
-    cleanup_terminal(sid, term_id)
+# --- PTY Spawn ---
 
-def cleanup_terminal(sid, term_id=None):
-    """Clean up terminal resources. If term_id is None, clean all for sid."""
-    if sid not in terminals:
+def spawn_pty(argv):
+    """Run argv on a new PTY as a session leader. Returns (pid, master_fd)."""
+    env = dict(os.environ, TERM='xterm-256color')
+    if not USE_POSIX_SPAWN or _pinned:
+        pid, fd = pty.fork()
+        if pid == 0:
+            # Child process
+            if _pinned:
+                os.sched_setaffinity(0, _default_cpus)
+            try:
+                os.execvpe(argv[0], argv, env)
+            finally:
+                os._exit(127)
+        return pid, fd
+
+    master_fd, slave_fd = os.openpty()
+    try:
+        # setsid() runs before the file actions, so opening the slave by
+        # path makes it the child's controlling terminal
+        pid = os.posix_spawnp(argv[0], argv, env, file_actions=[
+            (os.POSIX_SPAWN_OPEN, 0, os.ttyname(slave_fd), os.O_RDWR, 0),
+            (os.POSIX_SPAWN_DUP2, 0, 1),
+            (os.POSIX_SPAWN_DUP2, 0, 2),
+        ], setsid=True, setsigdef=(signal.SIGPIPE, signal.SIGXFSZ))
+    except BaseException:
+        os.close(master_fd)
+        raise
+    finally:
+        # The child has its own descriptors; both openpty fds are close-on-exec
+        os.close(slave_fd)
+    return pid, master_fd
+
+# --- PTY Input ---
+
+def queue_input(terminal, data):
+    """Buffer input for a terminal; control keys and large pastes flush at once."""
+    terminal['in_chunks'].append(data)
+    terminal['in_size'] += len(data)
+    if terminal['in_size'] >= INPUT_FLUSH_SIZE or (len(data) == 1 and data[0] < 0x20):
+        flush_input(terminal)
+    elif not terminal['in_timer']:
+        terminal['in_timer'] = True
+        socketio.start_background_task(delayed_flush, terminal)
+
+def delayed_flush(terminal):
+    """Background task: flush whatever input arrived during INPUT_FLUSH_DELAY."""
+    socketio.sleep(INPUT_FLUSH_DELAY)
+    terminal['in_timer'] = False
+    flush_input(terminal)
+
+def flush_input(terminal):
+    """Write all pending input with a single writev(); requeue any short write."""
+    chunks = terminal['in_chunks']
+    if not chunks:
+        return
+    try:
+        written = os.writev(terminal['fd'], chunks)
+    except BlockingIOError:
+        written = 0
+    except OSError as e:
+        print(f"Error writing to PTY: {e}")
+        chunks.clear()
+        terminal['in_size'] = 0
         return
 
-    if term_id is not None:
-        # Clean specific terminal
-        terminal = terminals[sid].pop(term_id, None)
-        if terminal:
-            try:
-                os.close(terminal['fd'])
-            except:
-                pass
-            try:
-                os.kill(terminal['pid'], signal.SIGTERM)
-            except:
-                pass
+    if written == terminal['in_size']:
+        chunks.clear()
+        terminal['in_size'] = 0
+        return
+
+    # PTY input buffer is full: keep the unwritten tail and retry shortly
+    rest = b''.join(chunks)[written:]
+    chunks[:] = [rest]
+    terminal['in_size'] = len(rest)
+    if not terminal['in_timer']:
+        terminal['in_timer'] = True
+        socketio.start_background_task(delayed_flush, terminal)
+
+# --- Terminal Registry ---
+
+def _shard(sid):
+    return hash(sid) & (TERMINAL_SHARDS - 1)
+
+def get_term(sid, term_id):
+    """Return the terminal dict for (sid, term_id), or None."""
+    # Lock-free: single dict lookups are atomic, and this is the input hot path
+    return _shards[_shard(sid)].get(sid, {}).get(term_id)
+
+def put_term(sid, term_id, terminal):
+    """Register a terminal for (sid, term_id)."""
+    i = _shard(sid)
+    with _shard_locks[i]:
+        _shards[i].setdefault(sid, {})[term_id] = terminal
+
+def pop_term(sid, term_id):
+    """Atomically remove and return one terminal, or None if already gone."""
+    i = _shard(sid)
+    with _shard_locks[i]:
+        terms = _shards[i].get(sid)
+        if not terms:
+            return None
+        terminal = terms.pop(term_id, None)
         # Remove sid if no more terminals
-        if not terminals[sid]:
-            del terminals[sid]
-    else:
-        # Clean all terminals for sid
-        for tid, terminal in list(terminals[sid].items()):
+        if not terms:
+            del _shards[i][sid]
+        return terminal
+
+def pop_terms(sid):
+    """Atomically remove and return every terminal for sid."""
+    i = _shard(sid)
+    with _shard_locks[i]:
+        return list(_shards[i].pop(sid, {}).values())
+
+# --- PTY Reader ---
+
+def watch_pty(sid, term_id, fd):
+    """Hand a PTY fd to the shared reader task."""
+    global _reader_started
+    _fd_to_sid[fd] = (sid, term_id)
+    hub = hubs.get_hub()
+    _hub_listeners[fd] = hub.add(hub.READ, fd, on_pty_readable, ignore, ignore)
+    with _reader_lock:
+        if not _reader_started:
+            _reader_started = True
+            socketio.start_background_task(reader_loop)
+
+def unwatch_pty(fd):
+    """Stop reading from a PTY fd. Must run before the fd is closed."""
+    # Output held for a closed terminal is dropped, so it can't be sent
+    # under a reused fd number
+    pending = _pending_output.pop(fd, None)
+    if pending is not None:
+        release_buffer(pending[2])
+    if _fd_to_sid.pop(fd, None) is not None:
+        hubs.get_hub().remove(_hub_listeners.pop(fd))
+        # A wakeup still queued for it must not be read under a reused fd
+        _ready_fds.discard(fd)
+
+def on_pty_readable(fd):
+    """Hub callback: note that fd is readable and wake the reader.
+
+    Runs on the hub greenlet, so it must not block or switch.
+    """
+    _ready_fds.add(fd)
+    if not _ready_event.ready():
+        _ready_event.send()
+
+def ignore(*args):
+    """Hub close notifications: unwatch_pty always runs before a PTY is closed."""
+
+def wait_ready(timeout=None):
+    """Block until some PTY is readable or timeout passes; returns the readable fds."""
+    global _ready_event
+    if not _ready_fds:
+        _ready_event.wait(timeout)
+    # The hub keeps reporting an fd for as long as it stays readable, so a
+    # fresh event per wait is enough to avoid missed wakeups
+    _ready_event = Event()
+    ready = list(_ready_fds)
+    _ready_fds.clear()
+    return ready
+
+def pin_server():
+    """Pin the process to READER_CPU so the output path keeps a warm cache."""
+    global _pinned
+    if READER_CPU is None:
+        return
+    if not _HAS_AFFINITY:
+        print("READER_CPU is not supported on this platform")
+        return
+    try:
+        os.sched_setaffinity(0, {int(READER_CPU)})
+    except (ValueError, OSError) as e:
+        print(f"Error pinning to CPU {READER_CPU}: {e}")
+        return
+    _pinned = True
+    print(f"Pinned to CPU {READER_CPU}; shells are started with fork "
+          "so they get the original CPU mask back")
+
+def reader_loop():
+    """Background task: block until any PTY is readable and forward its output."""
+    while True:
+        # Sleep until the next held frame is due, or indefinitely if none
+        timeout = None
+        if _pending_output:
+            flush_at = min(pending[4] for pending in _pending_output.values())
+            timeout = max(0, flush_at - time.monotonic())
+        for fd in wait_ready(timeout):
+            target = _fd_to_sid.get(fd)
+            if target is None:
+                continue
+            sid, term_id = target
             try:
-                os.close(terminal['fd'])
-            except:
-                pass
+                alive = drain_pty(sid, term_id, fd)
+            except Exception as e:
+                print(f"Error reading from PTY: {e}")
+                alive = False
+            if not alive:
+                # Terminal closed
+                unwatch_pty(fd)
+                socketio.emit('terminal_closed', {'termId': term_id}, to=sid)
+                cleanup_terminal(sid, term_id)
+
+        now = time.monotonic()
+        for fd, pending in list(_pending_output.items()):
+            if pending[4] <= now:
+                flush_output(fd)
+
+def acquire_buffer():
+    """Take an output buffer from this thread's free-list."""
+    free = getattr(_buf_pool, 'free', None)
+    if free:
+        return free.pop()
+    return bytearray(MAX_BATCH)
+
+def release_buffer(buf):
+    """Return an output buffer to this thread's free-list."""
+    free = getattr(_buf_pool, 'free', None)
+    if free is None:
+        free = _buf_pool.free = []
+    if len(free) < BUF_POOL_SIZE:
+        free.append(buf)
+
+def drain_pty(sid, term_id, fd):
+    """Coalesce readable PTY output into one frame. Returns False on EOF or error.
+
+    A small frame is held in _pending_output rather than sent at once, so
+    output that arrives over the next FLUSH_DELAY joins it; the reader task
+    sends it when it's due.
+    """
+    alive = True
+    pending = _pending_output.pop(fd, None)
+    if pending is None:
+        pending = [sid, term_id, acquire_buffer(), 0, time.monotonic() + FLUSH_DELAY]
+    buf, n = pending[2], pending[3]
+    view = memoryview(buf)
+    try:
+        while n < MAX_BATCH:
             try:
-                os.kill(terminal['pid'], signal.SIGTERM)
-            except:
-                pass
-        del terminals[sid]
+                # Read straight into the pooled buffer, no per-read bytes object
+                got = os.readv(fd, [view[n:]])
+            except BlockingIOError:
+                break
+            except OSError:
+                alive = False
+                break
+            if not got:
+                alive = False
+                break
+            n += got
+    finally:
+        view.release()
+
+    if not n:
+        release_buffer(buf)
+        return alive
+    pending[3] = n
+    _pending_output[fd] = pending
+    # Small burst: give the producer until flush_at before sending
+    if not alive or n >= SMALL_BATCH or time.monotonic() >= pending[4]:
+        flush_output(fd)
+    return alive
+
+def flush_output(fd):
+    """Send the frame held for a PTY, if any."""
+    pending = _pending_output.pop(fd, None)
+    if pending is None:
+        return
+    sid, term_id, buf, n, _ = pending
+    with memoryview(buf) as view:
+        # Raw bytes go out as a binary frame; xterm.js decodes UTF-8 itself
+        data = bytes(view[:n])
+    release_buffer(buf)
+    socketio.emit('terminal_output', {
+        'termId': term_id,
+        'data': data
+    }, to=sid)
+
+def cleanup_terminal(sid, term_id=None):
+    """Clean up terminal resources. If term_id is None, clean all for sid.
+
+    Popping a terminal from the registry claims it, so when disconnect,
+    reader EOF and reopen race, exactly one caller closes each PTY.
+    """
+    if term_id is None:
+        for terminal in pop_terms(sid):
+            close_terminal(terminal)
+        return
+
+    terminal = pop_term(sid, term_id)
+    if terminal:
+        close_terminal(terminal)
+
+def close_terminal(terminal):
+    """Release a terminal already removed from the registry."""
+    unwatch_pty(terminal['fd'])
+    # Drop queued input so a pending flush can't hit a reused fd number
+    terminal['in_chunks'].clear()
+    os.close(terminal['fd'])
+    try:
+        os.kill(terminal['pid'], signal.SIGTERM)
+    except ProcessLookupError:
+        return  # Already exited and reaped
+    socketio.start_background_task(reap_child, terminal['pid'])
+
+def reap_child(pid):
+    """Background task: SIGKILL a child that outlives KILL_GRACE, then reap it."""
+    socketio.sleep(KILL_GRACE)
+    try:
+        exited, _ = os.waitpid(pid, os.WNOHANG)
+        if not exited:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+    except ChildProcessError:
+        pass  # Reaped elsewhere
 
 if __name__ == '__main__':
+    pin_server()
     print("Starting Tmux Workspace on http://localhost:5001")
-    socketio.run(app, host='0.0.0.0', port=5001, debug=True, allow_unsafe_werkzeug=True)
+    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
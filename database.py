@@ -1,59 +1,92 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import hashlib
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    _loads = orjson.loads
+else:
+    def _dumps(obj):
+        return json.dumps(obj, separators=(',', ':'), sort_keys=True).encode()
+    _loads = json.loads
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'terminals.db')
 
+# One connection for the life of the process; _lock serializes statements
+_conn = None
+_lock = threading.RLock()
+
+# Digest of the last layout written per name, to skip unchanged autosaves
+_last_hash = {}
+
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    global _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            _conn = conn
+        return _conn
 
 def init_db():
-    conn = get_connection()
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS layouts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL DEFAULT 'default',
-            config TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with _lock, get_connection() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS layouts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL DEFAULT 'default',
+                config TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
 
 def save_layout(config, name='default'):
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
-    config_json = json.dumps(config)
-
-    conn.execute('''
-        INSERT INTO layouts (name, config, updated_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(name) DO UPDATE SET
-            config = excluded.config,
-            updated_at = excluded.updated_at
-    ''', (name, config_json, now))
-    conn.commit()
-    conn.close()
+    # Keys are sorted so key order alone doesn't defeat the dedup. Stored as
+    # a UTF-8 BLOB; _loads accepts both bytes and old TEXT rows.
+    config_blob = _dumps(config)
+    digest = hashlib.blake2b(config_blob, digest_size=16).digest()
+    if _last_hash.get(name) == digest:
+        return
+    now = str(int(time.time()))  # epoch seconds
+
+    with _lock, get_connection() as conn:
+        conn.execute('''
+            INSERT INTO layouts (name, config, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                config = excluded.config,
+                updated_at = excluded.updated_at
+        ''', (name, config_blob, now))
+    _last_hash[name] = digest
+
+def get_layout_raw(name='default'):
+    """Return the stored layout JSON without decoding it, or None."""
+    with _lock:
+        row = get_connection().execute(
+            'SELECT config FROM layouts WHERE name = ?', (name,)
+        ).fetchone()
+    return row['config'] if row else None
 
 def get_layout(name='default'):
-    conn = get_connection()
-    row = conn.execute(
-        'SELECT config FROM layouts WHERE name = ?', (name,)
-    ).fetchone()
-    conn.close()
-
-    if row:
-        return json.loads(row['config'])
+    raw = get_layout_raw(name)
+    if raw:
+        return _loads(raw)
     return None
 
 def delete_layout(name='default'):
-    conn = get_connection()
-    conn.execute('DELETE FROM layouts WHERE name = ?', (name,))
-    conn.commit()
-    conn.close()
+    with _lock, get_connection() as conn:
+        conn.execute('DELETE FROM layouts WHERE name = ?', (name,))
+    _last_hash.pop(name, None)
 
 # Initialize database on import
 init_db()
@@ -1,3 +1,6 @@
+import eventlet
+eventlet.monkey_patch()  # Must run before anything imports socket/select/threading
+
 import os
 import sys
 import pty
@@ -7,67 +10,261 @@ import struct
 import fcntl
 import termios
 import signal
+import stat
 import secrets
+import json
+import queue
+import tempfile
+import threading
+import time
 import logging
+import logging.handlers
+import atexit
 import mimetypes
 from datetime import datetime
+from eventlet import hubs
+from eventlet.event import Event
 from flask import Flask, render_template, jsonify, request, send_file, abort
 from flask_socketio import SocketIO, emit
 from . import database
+from . import tmux_control
+from . import file_watch
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:  # Flask < 2.2 has no pluggable JSON provider
+    DefaultJSONProvider = None
 
 # --- Logging Setup ---
 LOG_DIR = os.path.join(os.path.dirname(__file__), 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, f'tex-workspace-{datetime.now().strftime("%Y%m%d")}.log')
 
+class LogListener(logging.handlers.QueueListener):
+    """QueueListener whose worker is a real OS thread even under eventlet,
+    so log file and console writes never block the event loop."""
+
+    def start(self):
+        self._thread = eventlet.patcher.original('threading').Thread(
+            target=self._monitor, daemon=True)
+        self._thread.start()
+
+# Handlers only enqueue the formatted record; LogListener does the writes
+log_queue = eventlet.patcher.original('queue').SimpleQueue()
+log_listener = LogListener(
+    log_queue,
+    logging.FileHandler(LOG_FILE, delay=True),
+    logging.StreamHandler(sys.stdout),
+    respect_handler_level=True
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='[%(asctime)s] %(levelname)s: %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
 logger = logging.getLogger(__name__)
 
+# Un-patched os for the PTY and wakeup fds. They are already non-blocking, and
+# eventlet's green read/write always park on the hub first, which collides
+# when several input events write to one PTY at once.
+raw_os = eventlet.patcher.original('os')
+
+if orjson is not None and DefaultJSONProvider is not None:
+    class ORJSONProvider(DefaultJSONProvider):
+        """jsonify()/request.get_json() backed by orjson, mainly for large
+        directory listings. Types orjson can't encode go through Flask's
+        default hook."""
+
+        def encode(self, obj):
+            # Keys are sorted like Flask's own provider unless sort_keys is off
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option)
+
+        def dumps(self, obj, **kwargs):
+            return self.encode(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            if args and kwargs:
+                raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+            obj = args[0] if len(args) == 1 else (args or kwargs or None)
+            # Hand the encoded bytes straight to the response, no str round trip
+            return self._app.response_class(self.encode(obj), mimetype=self.mimetype)
+else:
+    ORJSONProvider = None
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(32)
-socketio = SocketIO(app, async_mode='threading', cors_allowed_origins='*')
+if ORJSONProvider is not None:
+    app.json = ORJSONProvider(app)
+socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins='*')
 
 # Track active PTY sessions: {sid: {termId: {'fd': fd, 'pid': pid, ...}}}
 terminals = {}
 
-# Allowed file extensions for the file browser
-ALLOWED_EXTENSIONS = {
-    '.tex', '.bib', '.sty', '.cls', '.txt', '.md',  # Text files
-    '.pdf',  # PDF files
-    '.jpg', '.jpeg', '.png', '.gif', '.svg',  # Images
+# PTY output is coalesced into one frame per burst: reads continue until the
+# fd is drained, OUTPUT_BATCH_SIZE bytes are buffered or OUTPUT_BATCH_WINDOW
+# seconds have passed
+OUTPUT_BATCH_SIZE = 65536
+OUTPUT_BATCH_WINDOW = 0.008
+
+# New bash terminals run `$SHELL -i` with the environment of one login shell,
+# captured once, instead of `$SHELL -l` re-running the profile each time.
+# --login-shell restores the old behaviour.
+app.config['LOGIN_SHELL'] = False
+LOGIN_ENV_SCRIPT = 'import json, os, sys; sys.stdout.write("\\0" + json.dumps(dict(os.environ)))'
+_login_env = None
+_login_env_lock = threading.Lock()
+
+# Preallocated read buffer, reused for every batch. Only the reactor task
+# reads PTYs, so one is enough.
+_read_buf = bytearray(OUTPUT_BATCH_SIZE)
+
+# One reactor task multiplexes every PTY fd: {fd: (sid, termId)}. Each fd is
+# registered once as a persistent reader on eventlet's hub (epoll/kqueue),
+# whose callback only records it in _ready_fds and wakes the reactor. The
+# patched selectors module can't be used for this: its select() adds and
+# removes a hub listener for every registered fd on each call.
+_watched = {}
+_hub_listeners = {}  # fd -> hub listener
+_ready_fds = set()
+_ready_event = Event()
+_reactor_started = False
+_reactor_lock = threading.Lock()
+
+# The reactor only reads; EMIT_WORKERS tasks send the frames. Output waiting
+# to be sent is kept per terminal and new reads are appended to it, so the
+# queues hold each terminal at most once and nothing is dropped. A terminal
+# always maps to the same worker, so its frames stay in order.
+EMIT_WORKERS = 2
+emit_queues = [queue.Queue() for _ in range(EMIT_WORKERS)]
+_pending_output = {}  # (sid, termId) -> bytearray not yet emitted
+
+# emit() only queues a frame on the client's connection, so output counts
+# as delivered once the client acknowledges it. When a terminal has
+# MAX_PENDING_OUTPUT bytes pending or unacknowledged, the reactor stops
+# reading its PTY until acks come back. A slow client then stalls its own
+# shell, which blocks writing to the full kernel PTY buffer, rather than
+# growing the server's memory.
+MAX_PENDING_OUTPUT = 4 * OUTPUT_BATCH_SIZE
+_unacked = {}  # (sid, termId) -> bytes emitted but not yet acknowledged
+_paused = {}  # (sid, termId) -> fd not read until enough output is acknowledged
+
+# After a pass that read output the reactor re-polls without blocking (each
+# poll yields to the hub and the emit workers), picking up the rest of a
+# burst at once; after REACTOR_SPIN empty polls it blocks until the next event
+REACTOR_SPIN = 4
+
+# File extensions shown in the file browser, by kind
+TEXT_EXTENSIONS = {'.tex', '.bib', '.sty', '.cls', '.txt', '.md'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.svg'}
+
+# Extension -> 'text', 'pdf' or 'image': one lookup classifies a file
+EXT_KIND = dict.fromkeys(TEXT_EXTENSIONS, 'text')
+EXT_KIND['.pdf'] = 'pdf'
+EXT_KIND.update(dict.fromkeys(IMAGE_EXTENSIONS, 'image'))
+
+ALLOWED_EXTENSIONS = set(EXT_KIND)
+
+# Content types for the files the viewers fetch, so serving them skips
+# mimetypes.guess_type; other extensions still go through it
+_MIME = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
 }
 
+def file_kind(filename):
+    """Return 'text', 'pdf' or 'image' for an allowed file, else None."""
+    return EXT_KIND.get(os.path.splitext(filename)[1].lower())
+
 def is_allowed_file(filename):
     """Check if file extension is in allowed list."""
-    ext = os.path.splitext(filename)[1].lower()
-    return ext in ALLOWED_EXTENSIONS
+    return file_kind(filename) is not None
 
 def is_text_file(filename):
     """Check if file is a text file we can edit."""
-    ext = os.path.splitext(filename)[1].lower()
-    return ext in {'.tex', '.bib', '.sty', '.cls', '.txt', '.md'}
+    return file_kind(filename) == 'text'
 
 def is_pdf_file(filename):
     """Check if file is a PDF."""
-    return filename.lower().endswith('.pdf')
+    return file_kind(filename) == 'pdf'
 
 def is_image_file(filename):
     """Check if file is an image."""
-    ext = os.path.splitext(filename)[1].lower()
-    return ext in {'.jpg', '.jpeg', '.png', '.gif', '.svg'}
+    return file_kind(filename) == 'image'
+
+def is_within_root(root, full_path):
+    """Check that a normalized path is the root or inside it.
+
+    Compares against the root plus a separator, so a sibling such as
+    /foo_bar doesn't pass for root /foo.
+    """
+    return full_path == root or full_path.startswith(root.rstrip(os.sep) + os.sep)
+
+# inotify watches on directories holding files being viewed, pushed to
+# clients as file_changed events. None until first use or if unavailable.
+_file_watcher = None
+_file_watcher_lock = threading.Lock()
+
+# Characters encoded and written per write() call when saving a file
+WRITE_CHUNK = 1 << 20
+
+# Process umask, for the mode of newly created files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_file_atomic(path, content):
+    """Replace a file's content through a fsynced temp file and os.replace().
+
+    Readers (and the mtime poll) see the old file or the new one, never a
+    truncated one, and a crash mid-write leaves the original intact.
+    """
+    # Write through symlinks rather than replacing the link itself
+    target = os.path.realpath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-', suffix='.swp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # Encode in slices so a large document never exists as one
+            # full-size bytes copy next to the str
+            for i in range(0, len(content), WRITE_CHUNK):
+                f.write(content[i:i + WRITE_CHUNK])
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600; keep the existing file's permissions
+        try:
+            mode = stat.S_IMODE(os.stat(target).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
 
 # --- HTTP Routes ---
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', file_events=file_watch.available)
 
 # --- File Browser API ---
 
@@ -84,50 +281,71 @@ def list_files():
     if path:
         full_path = os.path.normpath(os.path.join(root, path))
         # Security: ensure path is within root
-        if not full_path.startswith(root):
+        if not is_within_root(root, full_path):
             return jsonify({'error': 'Invalid path', 'files': []}), 403
     else:
         full_path = root
 
-    if not os.path.isdir(full_path):
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISDIR(st.st_mode):
         return jsonify({'error': 'Not a directory', 'files': []}), 404
 
+    # Adding, removing or renaming an entry updates the directory's mtime, so
+    # an unchanged listing is answered with a 304 before scanning anything.
+    # The browser revalidates every time because of no-cache.
+    etag = f'{st.st_dev:x}-{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}'
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        # Entry paths are relative to root; build them by concatenation
+        rel_prefix = '' if full_path == root else os.path.relpath(full_path, root) + os.sep
+        try:
+            files = list_directory(full_path, rel_prefix)
+        except PermissionError:
+            return jsonify({'error': 'Permission denied', 'files': []}), 403
+        response = jsonify({
+            'path': path,
+            'root': root,
+            'files': files
+        })
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def list_directory(full_path, rel_prefix):
+    """Return the browser entries of a directory, directories first."""
     files = []
-    try:
-        for name in sorted(os.listdir(full_path)):
+    # scandir's DirEntry.is_dir() uses the dirent type, so no stat()
+    # per entry except for symlinks
+    with os.scandir(full_path) as entries:
+        for entry in entries:
+            name = entry.name
             # Skip hidden files
             if name.startswith('.'):
                 continue
 
-            item_path = os.path.join(full_path, name)
-            rel_path = os.path.relpath(item_path, root)
-
-            is_dir = os.path.isdir(item_path)
+            is_dir = entry.is_dir()
+            kind = None if is_dir else file_kind(name)
 
             # Filter: show directories or allowed file types
-            if not is_dir and not is_allowed_file(name):
+            if not is_dir and kind is None:
                 continue
 
             files.append({
                 'name': name,
-                'path': rel_path,
+                'path': rel_prefix + name,
                 'isDirectory': is_dir,
-                'isText': not is_dir and is_text_file(name),
-                'isPdf': not is_dir and is_pdf_file(name),
-                'isImage': not is_dir and is_image_file(name),
+                'isText': kind == 'text',
+                'isPdf': kind == 'pdf',
+                'isImage': kind == 'image',
             })
 
-        # Sort: directories first, then files alphabetically
-        files.sort(key=lambda x: (not x['isDirectory'], x['name'].lower()))
-
-    except PermissionError:
-        return jsonify({'error': 'Permission denied', 'files': []}), 403
-
-    return jsonify({
-        'path': path,
-        'root': root,
-        'files': files
-    })
+    # Sort: directories first, then files alphabetically
+    files.sort(key=lambda x: (not x['isDirectory'], x['name'].lower(), x['name']))
+    return files
 
 @app.route('/api/file')
 def read_file():
@@ -141,7 +359,7 @@ def read_file():
     full_path = os.path.normpath(os.path.join(root, path))
 
     # Security: ensure path is within root
-    if not full_path.startswith(root):
+    if not is_within_root(root, full_path):
         return jsonify({'error': 'Invalid path'}), 403
 
     if not os.path.isfile(full_path):
@@ -164,9 +382,11 @@ def read_file():
 @app.route('/api/file', methods=['POST'])
 def save_file():
     """Save file content."""
-    data = request.get_json()
+    # Don't keep the parsed body cached on the request alongside content
+    data = request.get_json(cache=False)
     path = data.get('path', '')
     content = data.get('content', '')
+    del data
     root = database.get_root_directory()
 
     if not root or not path:
@@ -175,15 +395,14 @@ def save_file():
     full_path = os.path.normpath(os.path.join(root, path))
 
     # Security: ensure path is within root
-    if not full_path.startswith(root):
+    if not is_within_root(root, full_path):
         return jsonify({'error': 'Invalid path'}), 403
 
     if not is_text_file(full_path):
         return jsonify({'error': 'Not a text file'}), 400
 
     try:
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_file_atomic(full_path, content)
         logger.info(f"Saved file: {path}")
         return jsonify({'status': 'ok', 'path': path})
     except Exception as e:
@@ -201,18 +420,27 @@ def serve_raw_file(filepath):
     full_path = os.path.normpath(os.path.join(root, filepath))
 
     # Security: ensure path is within root
-    if not full_path.startswith(root):
+    if not is_within_root(root, full_path):
         abort(403)
 
     if not os.path.isfile(full_path):
         abort(404)
 
     # Determine mime type
-    mime_type, _ = mimetypes.guess_type(full_path)
+    mime_type = _MIME.get(os.path.splitext(full_path)[1].lower())
+    if mime_type is None:
+        mime_type, _ = mimetypes.guess_type(full_path)
     if mime_type is None:
         mime_type = 'application/octet-stream'
 
-    return send_file(full_path, mimetype=mime_type)
+    # Viewers reload on file_changed instead of polling the mtime
+    watch_directory(os.path.dirname(full_path))
+
+    # ETag/Last-Modified let the viewer revalidate: an unchanged PDF costs a
+    # 304 instead of a full transfer. no-cache makes it check every time.
+    response = send_file(full_path, mimetype=mime_type, conditional=True, etag=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # --- Directory Management API ---
 
@@ -284,7 +512,7 @@ def get_file_mtime():
 
     full_path = os.path.normpath(os.path.join(root, path))
 
-    if not full_path.startswith(root):
+    if not is_within_root(root, full_path):
         return jsonify({'mtime': None})
 
     if not os.path.isfile(full_path):
@@ -296,25 +524,76 @@ def get_file_mtime():
     except:
         return jsonify({'mtime': None})
 
+def watch_directory(directory):
+    """Report changes to files in directory as file_changed events."""
+    global _file_watcher
+    if not file_watch.available:
+        return
+    with _file_watcher_lock:
+        if _file_watcher is None:
+            try:
+                _file_watcher = file_watch.DirectoryWatcher()
+            except OSError as e:
+                logger.error(f"Error starting file watcher: {e}")
+                return
+            socketio.start_background_task(file_watch_loop, _file_watcher)
+    try:
+        _file_watcher.watch(directory)
+    except OSError as e:
+        logger.error(f"Error watching {directory}: {e}")
+
+def file_watch_loop(watcher):
+    """Background task: emit file_changed for each changed file under the root."""
+    while True:
+        select.select([watcher.fd], [], [])
+        prefix = database.get_root_prefix()
+        if not prefix:
+            watcher.read()
+            continue
+        for full_path in set(watcher.read()):
+            # Hidden files (including save temp files) aren't browsable
+            if full_path.startswith(prefix) and not os.path.basename(full_path).startswith('.'):
+                socketio.emit('file_changed', {'path': full_path[len(prefix):]})
+
 # --- Tmux Sessions API ---
 
+def tmux_lines(args):
+    """Run a tmux command and return its output lines, or None on failure.
+
+    Uses the persistent control-mode client, falling back to running tmux
+    directly if the client can't be started or has died.
+    """
+    try:
+        lines = tmux_control.run(args)
+    except OSError as e:
+        logger.warning(f"tmux control client unavailable: {e}")
+    else:
+        if lines is None:
+            return None
+        return [line.decode('utf-8', errors='replace') for line in lines]
+
+    result = subprocess.run(
+        ('tmux',) + args,
+        capture_output=True, text=True, timeout=5
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.splitlines()
+
 @app.route('/api/sessions')
 def get_sessions():
     """List all tmux sessions."""
     try:
-        result = subprocess.run(
-            ['tmux', 'list-sessions', '-F', '#{session_name}:#{session_windows}:#{session_attached}'],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.returncode != 0:
+        lines = tmux_lines(('list-sessions', '-F', '#{session_name}:#{session_windows}:#{session_attached}'))
+        if lines is None:
             return jsonify([])
 
         sessions = []
-        for line in result.stdout.strip().split('\n'):
+        for line in lines:
             if not line:
                 continue
             parts = line.split(':')
-            if len(parts) >= 3:
+            if len(parts) >= 3 and parts[0] != tmux_control.CONTROL_SESSION:
                 sessions.append({
                     'name': parts[0],
                     'windows': int(parts[1]),
@@ -355,29 +634,43 @@ def on_open_terminal(data):
     if sid not in terminals:
         terminals[sid] = {}
 
+    # Look up the project directory before forking: the child must not touch
+    # the parent's SQLite connection
+    root = database.get_root_directory()
+
     try:
+        if terminal_type == 'tmux' and session:
+            argv = ['tmux', 'attach-session', '-t', f'{session}:{window}']
+            env = dict(os.environ)
+        elif app.config['LOGIN_SHELL']:
+            # Spawn bash with login shell for proper env
+            shell = os.environ.get('SHELL', '/bin/bash')
+            argv = [shell, '-l']
+            env = dict(os.environ)
+        else:
+            # Interactive shell with the cached login environment, so the
+            # profile doesn't run again for every terminal
+            shell = os.environ.get('SHELL', '/bin/bash')
+            argv = [shell, '-i']
+            env = dict(get_login_env())
+        env['TERM'] = 'xterm-256color'
+
         # Create PTY
         pid, fd = pty.fork()
 
         if pid == 0:
-            # Child process
-            os.environ['TERM'] = 'xterm-256color'
-            # Change to project directory if set
-            root = database.get_root_directory()
-            if root and os.path.isdir(root):
-                os.chdir(root)
-
-            if terminal_type == 'tmux' and session:
-                os.execlp('tmux', 'tmux', 'attach-session', '-t', f'{session}:{window}')
-            else:
-                # Spawn bash with login shell for proper env
-                shell = os.environ.get('SHELL', '/bin/bash')
-                os.execlp(shell, shell, '-l')
+            # Child process: never return into the server, even if exec fails
+            try:
+                # Change to project directory if set
+                if root and os.path.isdir(root):
+                    os.chdir(root)
+                os.execvpe(argv[0], argv, env)
+            finally:
+                os._exit(127)
         else:
             # Parent process
             # Set non-blocking
-            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+            os.set_blocking(fd, False)
 
             terminals[sid][term_id] = {
                 'fd': fd,
@@ -388,7 +681,7 @@ def on_open_terminal(data):
             }
 
             # Start reading from PTY
-            socketio.start_background_task(read_pty, sid, term_id, fd)
+            watch_pty(sid, term_id, fd)
             emit('terminal_ready', {'status': 'ok', 'termId': term_id})
             logger.info(f"Terminal ready: sid={sid}, termId={term_id}")
 
@@ -408,7 +701,7 @@ def on_terminal_input(data):
 
     fd = terminals[sid][term_id]['fd']
     try:
-        os.write(fd, input_data.encode('utf-8'))
+        raw_os.write(fd, input_data.encode('utf-8'))
     except Exception as e:
         logger.error(f"Error writing to PTY: {e}")
 
@@ -431,31 +724,207 @@ def on_terminal_resize(data):
     except Exception as e:
         logger.error(f"Error resizing PTY: {e}")
 
-def read_pty(sid, term_id, fd):
-    """Background task to read from PTY and send to client."""
-    while sid in terminals and term_id in terminals[sid] and terminals[sid][term_id]['fd'] == fd:
+def get_login_env():
+    """Return the login shell's environment, capturing it on first use."""
+    global _login_env
+    with _login_env_lock:
+        if _login_env is None:
+            _login_env = capture_login_env()
+        return _login_env
+
+def capture_login_env():
+    """Run the user's login shell once and return the environment it sets up."""
+    shell = os.environ.get('SHELL', '/bin/bash')
+    try:
+        # Profiles may print to stdout, so the JSON follows a NUL marker
+        result = subprocess.run(
+            [shell, '-l', '-c', 'exec "$0" -c "$1"', sys.executable, LOGIN_ENV_SCRIPT],
+            stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=10
+        )
+        env = json.loads(result.stdout.rpartition('\0')[2])
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        logger.warning(f"Could not capture login shell environment: {e}")
+        return dict(os.environ)
+
+    # Per-shell state the new shell should set for itself
+    for key in ('PWD', 'OLDPWD', 'SHLVL', '_'):
+        env.pop(key, None)
+    logger.info(f"Captured login shell environment ({len(env)} variables)")
+    return env
+
+def watch_pty(sid, term_id, fd):
+    """Hand a PTY fd to the reactor task, starting it on first use."""
+    global _reactor_started
+    _watched[fd] = (sid, term_id)
+    hub = hubs.get_hub()
+    _hub_listeners[fd] = hub.add(hub.READ, fd, on_pty_readable, ignore, ignore)
+    with _reactor_lock:
+        if not _reactor_started:
+            _reactor_started = True
+            socketio.start_background_task(pty_reactor)
+            for q in emit_queues:
+                socketio.start_background_task(emit_worker, q)
+
+def unwatch_pty(fd):
+    """Stop reading from a PTY fd. Must run before the fd is closed."""
+    key = _watched.pop(fd, None)
+    if key is None:
+        return
+    if _paused.get(key) == fd:
+        del _paused[key]
+    _unacked.pop(key, None)
+    stop_reading(fd)
+
+def stop_reading(fd):
+    """Remove a PTY's hub listener, leaving it watched."""
+    listener = _hub_listeners.pop(fd, None)
+    if listener is not None:
+        hubs.get_hub().remove(listener)
+    # A wakeup still queued for it must not be read under a reused fd
+    _ready_fds.discard(fd)
+
+def pause_pty(sid, term_id, fd):
+    """Stop reading a PTY whose client is MAX_PENDING_OUTPUT bytes behind."""
+    _paused[(sid, term_id)] = fd
+    stop_reading(fd)
+
+def resume_pty(sid, term_id):
+    """Read a paused PTY again."""
+    fd = _paused.pop((sid, term_id), None)
+    if fd is not None and _watched.get(fd) == (sid, term_id):
+        hub = hubs.get_hub()
+        _hub_listeners[fd] = hub.add(hub.READ, fd, on_pty_readable, ignore, ignore)
+
+def on_pty_readable(fd):
+    """Hub callback: note that fd is readable and wake the reactor.
+
+    Runs on the hub greenlet, so it must not block or switch.
+    """
+    _ready_fds.add(fd)
+    if not _ready_event.ready():
+        _ready_event.send()
+
+def ignore(*args):
+    """Hub close notifications: unwatch_pty always runs before a PTY is closed."""
+
+def wait_ready(block):
+    """Return the PTY fds the hub has reported readable.
+
+    With block, waits until there is at least one; otherwise just yields
+    once so the hub can poll.
+    """
+    global _ready_event
+    if not _ready_fds:
+        if block:
+            _ready_event.wait()
+        else:
+            socketio.sleep(0)
+    # The hub keeps reporting an fd for as long as it stays readable, so a
+    # fresh event per wait is enough to avoid missed wakeups
+    _ready_event = Event()
+    ready = list(_ready_fds)
+    _ready_fds.clear()
+    return ready
+
+def pty_reactor():
+    """Background task: block until any PTY is readable and forward its output."""
+    idle_polls = REACTOR_SPIN
+    while True:
+        # Poll without blocking for a few passes after output, then block
+        ready = wait_ready(idle_polls >= REACTOR_SPIN)
+        got_output = False
+        for fd in ready:
+            target = _watched.get(fd)
+            if target is None or fd not in _hub_listeners:
+                continue  # Dropped, or paused earlier in this pass
+            sid, term_id = target
+            try:
+                data, alive = read_batch(fd)
+            except Exception as e:
+                logger.error(f"Error reading from PTY: {e}")
+                data, alive = b'', False
+            if data:
+                got_output = True
+                queue_output(sid, term_id, fd, data)
+            if alive:
+                continue
+
+            # EOF: unless the terminal was already closed or replaced
+            unwatch_pty(fd)
+            flush_output(sid, term_id)
+            terminal = terminals.get(sid, {}).get(term_id)
+            if terminal is not None and terminal['fd'] == fd:
+                socketio.emit('terminal_closed', {'termId': term_id}, to=sid)
+                cleanup_terminal(sid, term_id)
+        idle_polls = 0 if got_output else idle_polls + 1
+
+def queue_output(sid, term_id, fd, data):
+    """Hand PTY output to the emit workers without blocking the reactor."""
+    key = (sid, term_id)
+    pending = _pending_output.get(key)
+    if pending is None:
+        pending = _pending_output[key] = bytearray(data)
+        emit_queues[hash(key) % EMIT_WORKERS].put_nowait(key)
+    else:
+        # Still queued: coalesce into the frame that hasn't gone out yet
+        pending += data
+    if len(pending) + _unacked.get(key, 0) >= MAX_PENDING_OUTPUT:
+        pause_pty(sid, term_id, fd)
+
+def flush_output(sid, term_id):
+    """Emit a terminal's pending output now, e.g. before terminal_closed."""
+    key = (sid, term_id)
+    data = _pending_output.pop(key, None)
+    if data:
+        _unacked[key] = _unacked.get(key, 0) + len(data)
+        # Raw bytes go out as a binary frame; xterm.js decodes UTF-8 itself
+        socketio.emit('terminal_output', {
+            'termId': term_id,
+            'data': bytes(data)
+        }, to=sid, callback=lambda *args: output_acked(key, len(data)))
+
+def output_acked(key, size):
+    """Ack callback: the client has taken size bytes of a terminal's output."""
+    left = _unacked.get(key, 0) - size
+    if left > 0:
+        _unacked[key] = left
+    else:
+        _unacked.pop(key, None)
+    if key in _paused and left < MAX_PENDING_OUTPUT:
+        resume_pty(*key)
+
+def emit_worker(q):
+    """Background task: send output frames queued by the reactor."""
+    while True:
+        sid, term_id = q.get()
         try:
-            ready, _, _ = select.select([fd], [], [], 0.1)
-            if ready:
-                try:
-                    data = os.read(fd, 4096)
-                    if data:
-                        socketio.emit('terminal_output', {
-                            'termId': term_id,
-                            'data': data.decode('utf-8', errors='replace')
-                        }, to=sid)
-                    else:
-                        # EOF
-                        break
-                except OSError:
-                    break
+            flush_output(sid, term_id)
         except Exception as e:
-            logger.error(f"Error reading from PTY: {e}")
-            break
-
-    # Terminal closed
-    socketio.emit('terminal_closed', {'termId': term_id}, to=sid)
-    cleanup_terminal(sid, term_id)
+            logger.error(f"Error emitting terminal output: {e}")
+
+def read_batch(fd):
+    """Drain a readable PTY into one buffer. Returns (data, alive)."""
+    view = memoryview(_read_buf)
+    n = 0
+    alive = True
+    deadline = time.monotonic() + OUTPUT_BATCH_WINDOW
+    try:
+        while n < OUTPUT_BATCH_SIZE and time.monotonic() < deadline:
+            try:
+                # Read straight into the shared buffer, no per-read bytes object
+                got = raw_os.readv(fd, [view[n:]])
+            except BlockingIOError:
+                break
+            except OSError:
+                alive = False
+                break
+            if not got:
+                alive = False
+                break
+            n += got
+        return bytes(view[:n]), alive
+    finally:
+        view.release()
 
 def cleanup_terminal(sid, term_id=None):
     """Clean up terminal resources."""
@@ -465,6 +934,7 @@ def cleanup_terminal(sid, term_id=None):
     if term_id is not None:
         terminal = terminals[sid].pop(term_id, None)
         if terminal:
+            unwatch_pty(terminal['fd'])
             try:
                 os.close(terminal['fd'])
             except:
@@ -477,6 +947,7 @@ def cleanup_terminal(sid, term_id=None):
             del terminals[sid]
     else:
         for tid, terminal in list(terminals[sid].items()):
+            unwatch_pty(terminal['fd'])
             try:
                 os.close(terminal['fd'])
             except:
@@ -491,6 +962,7 @@ def cleanup_all_terminals():
     """Clean up all terminal resources on shutdown."""
     for sid in list(terminals.keys()):
         for term_id, terminal in list(terminals.get(sid, {}).items()):
+            unwatch_pty(terminal['fd'])
             try:
                 os.close(terminal['fd'])
             except:
@@ -517,10 +989,26 @@ def main():
                         help='Host to bind to (default: 0.0.0.0)')
     parser.add_argument('--directory', '-d', default=None,
                         help='Directory to open on startup')
+    parser.add_argument('--x-sendfile', action='store_true',
+                        help='Serve PDFs and images with X-Sendfile; only behind a '
+                             'proxy that handles it (Apache mod_xsendfile, lighttpd)')
+    parser.add_argument('--login-shell', action='store_true',
+                        help='Start every terminal as a login shell (slower; by '
+                             'default the login environment is captured once)')
     parser.add_argument('--version', '-v', action='version',
                         version='%(prog)s 1.0.0')
     args = parser.parse_args()
 
+    # Leave raw file bodies to the front-end server's sendfile(2); Werkzeug
+    # otherwise streams them through Python (or wsgi.file_wrapper if the
+    # WSGI server provides one)
+    app.config['USE_X_SENDFILE'] = args.x_sendfile
+
+    app.config['LOGIN_SHELL'] = args.login_shell
+    if not args.login_shell:
+        # Capture the login environment now so the first terminal is fast too
+        socketio.start_background_task(get_login_env)
+
     # Set initial directory if provided
     if args.directory:
         path = os.path.expanduser(args.directory)
@@ -542,7 +1030,7 @@ def main():
 
     logger.info(f"Server starting on {args.host}:{args.port}")
 
-    socketio.run(app, host=args.host, port=args.port, debug=False, allow_unsafe_werkzeug=True)
+    socketio.run(app, host=args.host, port=args.port, debug=False)
 
 
 if __name__ == '__main__':
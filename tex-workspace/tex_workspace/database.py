@@ -1,135 +1,176 @@
 import sqlite3
 import json
 import os
+import atexit
+import threading
 from datetime import datetime
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'tex_workspace.db')
 
+# One connection for the life of the process, so each call reuses the open
+# file, page cache and sqlite3's statement cache. The threaded server starts a
+# thread per request, so per-thread connections would never be reused.
+# Autocommit mode (isolation_level=None); _lock serializes statements.
+_conn = None
+_lock = threading.RLock()
+
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    global _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            _conn = conn
+        return _conn
+
+@atexit.register
+def close_connection():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
 
 def init_db():
-    conn = get_connection()
-
-    # Layouts table (stores GoldenLayout config)
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS layouts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL DEFAULT 'default',
-            config TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-    ''')
-
-    # Settings table (key-value store)
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL
-        )
-    ''')
-
-    # Recent directories
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS recent_directories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            path TEXT UNIQUE NOT NULL,
-            last_opened TEXT NOT NULL
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+
+        # Layouts table (stores GoldenLayout config)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS layouts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL DEFAULT 'default',
+                config TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+
+        # Settings table (key-value store)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+
+        # Recent directories
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS recent_directories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT UNIQUE NOT NULL,
+                last_opened TEXT NOT NULL
+            )
+        ''')
 
 # --- Layout operations ---
 
 def save_layout(config, name='default'):
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
-    config_json = json.dumps(config)
-
-    existing = conn.execute(
-        'SELECT id FROM layouts WHERE name = ?', (name,)
-    ).fetchone()
-
-    if existing:
-        conn.execute(
-            'UPDATE layouts SET config = ?, updated_at = ? WHERE name = ?',
-            (config_json, now, name)
-        )
-    else:
-        conn.execute(
-            'INSERT INTO layouts (name, config, updated_at) VALUES (?, ?, ?)',
-            (name, config_json, now)
-        )
-
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+        now = datetime.utcnow().isoformat()
+        config_json = json.dumps(config)
+
+        existing = conn.execute(
+            'SELECT id FROM layouts WHERE name = ?', (name,)
+        ).fetchone()
+
+        if existing:
+            conn.execute(
+                'UPDATE layouts SET config = ?, updated_at = ? WHERE name = ?',
+                (config_json, now, name)
+            )
+        else:
+            conn.execute(
+                'INSERT INTO layouts (name, config, updated_at) VALUES (?, ?, ?)',
+                (name, config_json, now)
+            )
 
 def get_layout(name='default'):
-    conn = get_connection()
-    row = conn.execute(
-        'SELECT config FROM layouts WHERE name = ?', (name,)
-    ).fetchone()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+        row = conn.execute(
+            'SELECT config FROM layouts WHERE name = ?', (name,)
+        ).fetchone()
 
-    if row:
-        return json.loads(row['config'])
-    return None
+        if row:
+            return json.loads(row['config'])
+        return None
 
 def delete_layout(name='default'):
-    conn = get_connection()
-    conn.execute('DELETE FROM layouts WHERE name = ?', (name,))
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+        conn.execute('DELETE FROM layouts WHERE name = ?', (name,))
 
 # --- Settings ---
 
 def get_setting(key, default=None):
-    conn = get_connection()
-    row = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
-    conn.close()
-    return row['value'] if row else default
+    with _lock:
+        conn = get_connection()
+        row = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else default
 
 def set_setting(key, value):
-    conn = get_connection()
-    conn.execute(
-        'INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = ?',
-        (key, value, value)
-    )
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+        conn.execute(
+            'INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = ?',
+            (key, value, value)
+        )
+
+# root_directory is read on nearly every request but only changes through
+# set_root_directory, so it is loaded once and then served from memory
+# 'prefix' is the root with a trailing separator, for containment checks.
+_root_cache = {'value': None, 'prefix': None, 'loaded': False}
+
+def _cache_root(path):
+    _root_cache['value'] = path
+    if path is None or path.endswith(os.sep):
+        _root_cache['prefix'] = path
+    else:
+        _root_cache['prefix'] = path + os.sep
+    _root_cache['loaded'] = True
 
 def get_root_directory():
-    return get_setting('root_directory')
+    if not _root_cache['loaded']:
+        with _lock:
+            if not _root_cache['loaded']:
+                _cache_root(get_setting('root_directory'))
+    return _root_cache['value']
+
+def get_root_prefix():
+    """Return the root directory with a trailing separator, or None."""
+    get_root_directory()
+    return _root_cache['prefix']
 
 def set_root_directory(path):
-    set_setting('root_directory', path)
+    with _lock:
+        set_setting('root_directory', path)
+        _cache_root(path)
     add_recent_directory(path)
 
 # --- Recent directories ---
 
 def add_recent_directory(path):
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
-    conn.execute(
-        'INSERT INTO recent_directories (path, last_opened) VALUES (?, ?) '
-        'ON CONFLICT(path) DO UPDATE SET last_opened = ?',
-        (path, now, now)
-    )
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+        now = datetime.utcnow().isoformat()
+        conn.execute(
+            'INSERT INTO recent_directories (path, last_opened) VALUES (?, ?) '
+            'ON CONFLICT(path) DO UPDATE SET last_opened = ?',
+            (path, now, now)
+        )
 
 def get_recent_directories(limit=10):
-    conn = get_connection()
-    rows = conn.execute(
-        'SELECT path FROM recent_directories ORDER BY last_opened DESC LIMIT ?',
-        (limit,)
-    ).fetchall()
-    conn.close()
-    return [row['path'] for row in rows]
+    with _lock:
+        conn = get_connection()
+        rows = conn.execute(
+            'SELECT path FROM recent_directories ORDER BY last_opened DESC LIMIT ?',
+            (limit,)
+        ).fetchall()
+        return [row['path'] for row in rows]
 
 # Initialize database on import
 init_db()
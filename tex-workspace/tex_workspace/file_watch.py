@@ -0,0 +1,89 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+# Minimal inotify bindings, so open viewers can be told when a file changes
+# instead of polling /api/file-mtime. Linux only; see `available`.
+
+# inotify event bits (<sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_IGNORED = 0x00008000
+
+# A file finished writing, or was renamed into place (atomic saves, latexmk)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO
+
+# struct inotify_event header: wd, mask, cookie, len; the name follows
+_EVENT = struct.Struct('iIII')
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+_libc = _load_libc()
+
+# False where inotify is missing; callers should fall back to polling
+available = _libc is not None
+
+def _raise_errno(path=None):
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err), path)
+
+class DirectoryWatcher:
+    """Watch directories and report files written or moved into them."""
+
+    def __init__(self):
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            _raise_errno()
+        self.fd = fd
+        self._dirs = {}  # wd -> [directory, ...]; aliases share a wd
+        self._watched = set()
+
+    def watch(self, directory):
+        """Start watching a directory; repeated calls are no-ops."""
+        if directory in self._watched:
+            return
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            _raise_errno(directory)
+        self._dirs.setdefault(wd, []).append(directory)
+        self._watched.add(directory)
+
+    def read(self):
+        """Return the paths of files changed since the last call."""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_IGNORED:
+                # Directory deleted or unmounted; the kernel dropped the watch
+                for directory in self._dirs.pop(wd, ()):
+                    self._watched.discard(directory)
+                continue
+            if name:
+                name = os.fsdecode(name)
+                for directory in self._dirs.get(wd, ()):
+                    paths.append(os.path.join(directory, name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
@@ -50,20 +50,12 @@ def migrate():
 
     # Save layout for this group
     config_json = json.dumps(v1_config)
-    existing_layout = v2_conn.execute(
-        "SELECT id FROM layouts WHERE group_id = ?", (group_id,)
-    ).fetchone()
-
-    if existing_layout:
-        v2_conn.execute(
-            "UPDATE layouts SET config = ?, updated_at = ? WHERE group_id = ?",
-            (config_json, now, group_id)
-        )
-    else:
-        v2_conn.execute(
-            "INSERT INTO layouts (group_id, config, updated_at) VALUES (?, ?, ?)",
-            (group_id, config_json, now)
-        )
+    v2_conn.execute(
+        "INSERT INTO layouts (group_id, config, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(group_id) DO UPDATE SET "
+        "config = excluded.config, updated_at = excluded.updated_at",
+        (group_id, config_json, now)
+    )
 
     # Set as active group
     v2_conn.execute(
@@ -1,6 +1,24 @@
 """Entry point for python -m tmux_workspace."""
 
-from .app import main
+import argparse
+import os
+
+
+def main():
+    """Pick the concurrency mode from argv, then run the app."""
+    # The app chooses eventlet or threads at import time, so --threading is
+    # read here first; app.main() parses (and documents) the full command line.
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument('--threading', action='store_true')
+    threaded = pre.parse_known_args()[0].threading
+    if threaded:
+        os.environ['TMUX_WORKSPACE_THREADING'] = '1'
+    from .app import main as app_main
+    if threaded:
+        # Don't hand it down to shells started from the workspace
+        del os.environ['TMUX_WORKSPACE_THREADING']
+    app_main()
+
 
 if __name__ == "__main__":
     main()
@@ -1,30 +1,70 @@
 import os
+
+# TMUX_WORKSPACE_THREADING=1 falls back to OS threads and the Werkzeug server.
+# It has to be known before eventlet patches anything, so it comes from the
+# environment; the command-line entry point sets it from --threading.
+USE_EVENTLET = os.environ.get('TMUX_WORKSPACE_THREADING', '') in ('', '0')
+if USE_EVENTLET:
+    import eventlet
+    eventlet.monkey_patch()  # Must run before anything imports socket/select/threading
+
 import sys
 import pty
-import select
+import selectors
 import subprocess
 import struct
 import fcntl
 import termios
 import signal
 import threading
+import time
 import secrets
+import json
+import contextlib
+import codecs
+import hashlib
+import hmac
 import logging
+import logging.handlers
+import atexit
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, redirect, make_response
+from flask import Flask, Response, render_template, jsonify, request, redirect, make_response, g
 from flask_socketio import SocketIO, emit, disconnect
-from functools import wraps
+from functools import wraps, lru_cache
+from markupsafe import escape
 from . import database
+from . import tmux_control
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:  # Flask < 2.2 has no pluggable JSON provider
+    DefaultJSONProvider = None
 
 # --- Token Authentication ---
 TOKEN_ENABLED = True  # Will be set by --no-token flag
 
+def token_matches(token):
+    """Constant-time comparison against the access token."""
+    if not token:
+        return False
+    return hmac.compare_digest(token.encode(), access_token_bytes())
+
 def check_token():
-    """Check if request has valid token via query param or cookie."""
+    """Check if request has valid token via query param or cookie.
+
+    The result is kept on `g`, so it is worked out once per request.
+    """
     if not TOKEN_ENABLED:
         return True
-    token = request.args.get('token') or request.cookies.get('tmux_token')
-    return token == ACCESS_TOKEN
+    if 'tmux_token_ok' not in g:
+        token = request.args.get('token') or request.cookies.get('tmux_token')
+        g.tmux_token_ok = token_matches(token)
+    return g.tmux_token_ok
 
 def token_required(f):
     """Decorator for routes that require token auth."""
@@ -42,26 +82,66 @@ LOG_DIR = os.path.join(os.path.dirname(__file__), 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, f'tmux-workspace-{datetime.now().strftime("%Y%m%d")}.log')
 
+# Under eventlet the listener needs the unpatched modules: a green thread's
+# file writes would still block the hub
+if USE_EVENTLET:
+    _os_threading = eventlet.patcher.original('threading')
+    _os_queue = eventlet.patcher.original('queue')
+else:
+    import queue as _os_queue
+    _os_threading = threading
+
+class LogListener(logging.handlers.QueueListener):
+    """QueueListener whose worker is a real OS thread even under eventlet,
+    so log file and console writes never block the event loop."""
+
+    def start(self):
+        self._thread = _os_threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+# Handlers only enqueue the formatted record; LogListener does the writes
+log_queue = _os_queue.SimpleQueue()
+log_listener = LogListener(
+    log_queue,
+    logging.FileHandler(LOG_FILE, delay=True),
+    logging.StreamHandler(sys.stdout),
+    respect_handler_level=True
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='[%(asctime)s] %(levelname)s: %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
 logger = logging.getLogger(__name__)
 
 # --- Access Token ---
-ACCESS_TOKEN = secrets.token_urlsafe(24)
+# Generated on first use rather than at import; tests can swap it by
+# patching access_token() or calling access_token.cache_clear()
+
+@lru_cache(maxsize=None)
+def access_token():
+    """The access token for this server process."""
+    return secrets.token_urlsafe(24)
+
+@lru_cache(maxsize=None)
+def session_secret():
+    """The session signing key for this server process."""
+    return secrets.token_hex(32)
+
+@lru_cache(maxsize=None)
+def access_token_bytes():
+    """access_token() encoded once, for compare_digest."""
+    return access_token().encode('ascii')
 
 # --- Shutdown Handling ---
 shutdown_requested = False
 shutdown_confirmed = False
-shutdown_timer = None
 
 def handle_shutdown(signum, frame):
-    global shutdown_requested, shutdown_confirmed, shutdown_timer
+    global shutdown_requested, shutdown_confirmed
 
     if shutdown_confirmed:
         return  # Already shutting down
@@ -69,63 +149,256 @@ def handle_shutdown(signum, frame):
     if shutdown_requested:
         # Second Ctrl+C - confirm shutdown
         shutdown_confirmed = True
-        if shutdown_timer:
-            shutdown_timer.cancel()
         print("\n\nShutting down...")
         logger.info("Shutdown confirmed by user")
         cleanup_all_terminals()
+        log_listener.stop()  # os._exit skips atexit; flush queued records first
         os._exit(0)
     else:
         # First Ctrl+C - ask for confirmation
         shutdown_requested = True
         print("\n\nInterrupt received. Press Ctrl+C again within 5 seconds to exit, or wait to resume...")
         logger.info("Shutdown requested - waiting for confirmation")
-
-        def reset_shutdown():
-            global shutdown_requested
-            if not shutdown_confirmed:
-                shutdown_requested = False
-                print("\nResuming server... (press Ctrl+C twice to exit)")
-                logger.info("Shutdown cancelled - resuming")
-
-        shutdown_timer = threading.Timer(5.0, reset_shutdown)
-        shutdown_timer.start()
+        # A real OS thread even under eventlet: the hub sleeps through a green
+        # timer armed from a signal handler until something else wakes it.
+        # Daemonized so a pending timer never holds the process open.
+        timer = _os_threading.Timer(5.0, reset_shutdown)
+        timer.daemon = True
+        timer.start()
+
+def reset_shutdown():
+    """Timer callback: resume if the shutdown wasn't confirmed in time."""
+    global shutdown_requested
+    if not shutdown_confirmed:
+        shutdown_requested = False
+        print("\nResuming server... (press Ctrl+C twice to exit)")
+        logger.info("Shutdown cancelled - resuming")
 
 def cleanup_all_terminals():
     """Clean up all terminal resources on shutdown."""
-    for sid in list(terminals.keys()):
-        for term_id, terminal in list(terminals.get(sid, {}).items()):
-            try:
-                os.close(terminal['fd'])
-            except:
-                pass
-            try:
-                os.kill(terminal['pid'], signal.SIGTERM)
-            except:
-                pass
+    for terminal in list(terminals.values()):
+        terminal.close()
     logger.info("All terminals cleaned up")
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = secrets.token_hex(32)
-socketio = SocketIO(app, async_mode='threading', cors_allowed_origins='*')
-
-# Track active PTY sessions: {sid: {termId: {'fd': fd, 'pid': pid, ...}}}
+# Un-patched os for the PTY and wakeup fds. They are already non-blocking, and
+# eventlet's green read/write always park on the hub first, which collides
+# when several input events write to one PTY at once.
+raw_os = eventlet.patcher.original('os') if USE_EVENTLET else os
+
+if orjson is not None:
+    class ORJSONModule:
+        """The json-module interface python-socketio encodes packets with
+        (str in, str out; keyword options ignored), backed by orjson."""
+
+        @staticmethod
+        def dumps(obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        @staticmethod
+        def loads(s, **kwargs):
+            return orjson.loads(s)
+else:
+    ORJSONModule = None
+
+if orjson is not None and DefaultJSONProvider is not None:
+    class ORJSONProvider(DefaultJSONProvider):
+        """jsonify()/request.get_json() backed by orjson. Types orjson can't
+        encode go through Flask's default hook."""
+
+        def encode(self, obj):
+            # Keys are sorted like Flask's own provider unless sort_keys is off
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option)
+
+        def dumps(self, obj, **kwargs):
+            return self.encode(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            if args and kwargs:
+                raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+            obj = args[0] if len(args) == 1 else (args or kwargs or None)
+            # Hand the encoded bytes straight to the response, no str round trip
+            return self._app.response_class(self.encode(obj), mimetype=self.mimetype)
+else:
+    ORJSONProvider = None
+
+# Compact JSON for bodies built outside jsonify()
+if ORJSONModule is not None:
+    json_dumps = ORJSONModule.dumps
+else:
+    def json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+class WorkspaceFlask(Flask):
+    """Flask app whose session key is drawn the first time a session needs
+    it rather than at import. A SECRET_KEY set in the config still wins."""
+
+    @property
+    def secret_key(self):
+        return self.config['SECRET_KEY'] or session_secret()
+
+    @secret_key.setter
+    def secret_key(self, value):
+        self.config['SECRET_KEY'] = value
+
+app = WorkspaceFlask(__name__)
+if ORJSONProvider is not None:
+    app.json = ORJSONProvider(app)
+# Gzip long-polling responses from 512 bytes rather than the default 1 KB.
+# This doesn't touch the websocket terminal stream.
+socketio = SocketIO(app, async_mode='eventlet' if USE_EVENTLET else 'threading',
+                    cors_allowed_origins='*', compression_threshold=512,
+                    json=ORJSONModule or json)
+
+class Terminal:
+    """A PTY and the process running in it, owned by one Socket.IO client."""
+
+    # Looked up on every input and resize event; slots keep attribute
+    # access cheap and the instances small
+    __slots__ = ('fd', 'pid', 'type', 'session', 'window',
+                 'in_chunks', 'in_size', 'in_timer', 'in_lock',
+                 'geom', 'want_geom', 'resize_timer')
+
+    def __init__(self, fd, pid, type, session, window):
+        self.fd = fd
+        self.pid = pid
+        self.type = type
+        self.session = session
+        self.window = window
+        self.in_chunks = []  # pending input, flushed with one writev()
+        self.in_size = 0
+        self.in_timer = False
+        # With --threading, input events and the flush timer run on separate
+        # OS threads; under eventlet nothing in the input path yields
+        self.in_lock = contextlib.nullcontext() if USE_EVENTLET else threading.Lock()
+        self.geom = None  # (rows, cols) last applied with TIOCSWINSZ
+        self.want_geom = None  # (rows, cols) last requested by the client
+        self.resize_timer = False
+
+    def close(self):
+        """Stop reading the PTY, close it and hang up the child."""
+        unwatch_pty(self.fd)
+        # Drop queued input and resizes so a pending flush can't hit a
+        # reused fd number
+        with self.in_lock:
+            self.in_chunks.clear()
+            self.in_size = 0
+        self.want_geom = None
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        # SIGHUP rather than SIGTERM: an interactive shell ignores SIGTERM
+        try:
+            os.kill(self.pid, signal.SIGHUP)
+        except ProcessLookupError:
+            return  # Already exited and reaped
+        socketio.start_background_task(reap_child, self.pid)
+
+def reap_child(pid):
+    """Background task: SIGKILL a child that outlives KILL_GRACE, then reap it."""
+    socketio.sleep(KILL_GRACE)
+    try:
+        exited, _ = os.waitpid(pid, os.WNOHANG)
+        if not exited:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+    except ChildProcessError:
+        pass  # Reaped elsewhere
+
+# Active terminals: {(sid, termId): Terminal}
 terminals = {}
 
+# Once select() reports output, the PTY is drained OUTPUT_READ_SIZE bytes at
+# a time until it would block. Output is staged per PTY and goes out as one
+# emit when OUTPUT_BATCH_SIZE bytes are waiting or OUTPUT_FLUSH_DELAY seconds
+# after the first of them arrived, so a burst spread over several wakeups
+# still becomes one frame.
+OUTPUT_READ_SIZE = 4096
+OUTPUT_BATCH_SIZE = 65536
+OUTPUT_FLUSH_DELAY = 0.005
+_pending_output = {}  # fd -> [sid, termId, bytearray, flush_at]
+
+# --legacy-json: send output as text for clients that can't take binary
+# frames. Each PTY gets an incremental decoder, so a UTF-8 sequence split
+# across two batches is completed rather than replaced.
+LEGACY_JSON_OUTPUT = False
+_output_decoders = {}  # fd -> codecs.IncrementalDecoder
+utf8_decoder = codecs.getincrementaldecoder('utf-8')
+
+# Preallocated read buffer, reused for every batch. Only the reactor task
+# reads PTYs, so one is enough.
+_read_buf = bytearray(OUTPUT_BATCH_SIZE)
+
+# Keystrokes are coalesced for up to INPUT_FLUSH_DELAY or INPUT_FLUSH_SIZE bytes
+INPUT_FLUSH_SIZE = 4096
+INPUT_FLUSH_DELAY = 0.002
+# writev() fails with EINVAL past IOV_MAX buffers (1024 on Linux and macOS),
+# and a burst of single keystrokes can queue that many before INPUT_FLUSH_SIZE
+INPUT_FLUSH_CHUNKS = 1024
+
+# A drag of the layout splitter sends a resize per mousemove; they are
+# applied at most once per RESIZE_DELAY seconds
+RESIZE_DELAY = 0.03
+
+# Seconds a closed terminal's child gets after SIGHUP before SIGKILL
+KILL_GRACE = 2.0
+
+# Optional core for the PTY reactor (Linux only), set by --reader-cpu. Under
+# eventlet the reactor and every handler share one OS thread, so this pins
+# all of them; with --threading only the reactor thread. Spawned shells get
+# the original mask back.
+READER_CPU = None
+_HAS_AFFINITY = hasattr(os, 'sched_setaffinity')
+_default_cpus = os.sched_getaffinity(0) if _HAS_AFFINITY else None
+
+# Start shells with posix_spawn (vfork+exec on glibc) rather than pty.fork(),
+# which copies the whole server's page tables. It can't restore the CPU mask,
+# so a pinned server keeps using fork.
+USE_POSIX_SPAWN = hasattr(os, 'posix_spawnp') and sys.platform.startswith('linux')
+
+# One reactor task multiplexes every PTY fd: {fd: (sid, termId)}
+_watched = {}
+_reactor_started = False
+_reactor_lock = threading.Lock()
+# Held while staging output and while unwatch_pty drops an fd, so with
+# --threading a read in flight can't re-stage output for an fd just dropped
+_watch_lock = threading.Lock()
+
+if USE_EVENTLET:
+    # Each fd is registered once as a persistent reader on eventlet's hub
+    # (epoll/kqueue), whose callback only records it in _ready_fds and wakes
+    # the reactor. The patched selectors module can't be used for this: its
+    # select() adds and removes a hub listener for every registered fd on
+    # each call.
+    _hub_listeners = {}  # fd -> hub listener
+    _ready_fds = set()
+    _ready_event = eventlet.event.Event()
+else:
+    # With --threading the reactor is a real thread blocked in epoll/kqueue.
+    # A self-pipe wakes it when an fd is registered or dropped.
+    selector = selectors.DefaultSelector()
+    _wakeup_r, _wakeup_w = os.pipe()
+    os.set_blocking(_wakeup_r, False)
+    os.set_blocking(_wakeup_w, False)
+    selector.register(_wakeup_r, selectors.EVENT_READ)
+
 # --- HTTP Routes ---
 
-@app.route('/login')
-def login():
-    """Login page for token entry."""
-    next_url = request.args.get('next', '/')
-    error = request.args.get('error', '')
-    return f'''
+# The login page is static apart from the error line and the next URL, so
+# it is assembled from pieces built once at import
+_LOGIN_HEAD = '''
     <!DOCTYPE html>
     <html>
     <head>
         <title>Tmux Workspace - Login</title>
         <style>
-            body {{
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
                 background: #1e1e1e;
                 color: #cccccc;
@@ -134,17 +407,17 @@ def login():
                 align-items: center;
                 height: 100vh;
                 margin: 0;
-            }}
-            .login-box {{
+            }
+            .login-box {
                 background: #252526;
                 padding: 40px;
                 border-radius: 8px;
                 text-align: center;
                 max-width: 400px;
-            }}
-            h1 {{ color: #ffffff; margin-bottom: 10px; }}
-            p {{ color: #888888; margin-bottom: 20px; }}
-            input[type="text"] {{
+            }
+            h1 { color: #ffffff; margin-bottom: 10px; }
+            p { color: #888888; margin-bottom: 20px; }
+            input[type="text"] {
                 width: 100%;
                 padding: 12px;
                 border: 1px solid #3c3c3c;
@@ -154,12 +427,12 @@ def login():
                 font-size: 16px;
                 margin-bottom: 16px;
                 box-sizing: border-box;
-            }}
-            input[type="text"]:focus {{
+            }
+            input[type="text"]:focus {
                 outline: none;
                 border-color: #0e639c;
-            }}
-            button {{
+            }
+            button {
                 width: 100%;
                 padding: 12px;
                 background: #0e639c;
@@ -168,18 +441,21 @@ def login():
                 border-radius: 4px;
                 font-size: 16px;
                 cursor: pointer;
-            }}
-            button:hover {{ background: #1177bb; }}
-            .error {{ color: #f44747; margin-bottom: 16px; }}
+            }
+            button:hover { background: #1177bb; }
+            .error { color: #f44747; margin-bottom: 16px; }
         </style>
     </head>
     <body>
         <div class="login-box">
             <h1>Tmux Workspace</h1>
             <p>Enter your access token to continue</p>
-            {"<p class='error'>Invalid token</p>" if error else ""}
-            <form method="POST" action="/auth">
-                <input type="hidden" name="next" value="{next_url}">
+'''
+_LOGIN_ERROR = '''            <p class='error'>Invalid token</p>
+'''
+_LOGIN_FORM = '''            <form method="POST" action="/auth">
+                <input type="hidden" name="next" value="'''
+_LOGIN_TAIL = '''">
                 <input type="text" name="token" placeholder="Access token" autofocus>
                 <button type="submit">Login</button>
             </form>
@@ -188,13 +464,22 @@ def login():
     </html>
     '''
 
+@app.route('/login')
+def login():
+    """Login page for token entry."""
+    next_url = request.args.get('next', '/')
+    error = request.args.get('error', '')
+    # next comes from the query string; escape it before it lands in an attribute
+    return (_LOGIN_HEAD + (_LOGIN_ERROR if error else '') + _LOGIN_FORM
+            + str(escape(next_url)) + _LOGIN_TAIL)
+
 @app.route('/auth', methods=['POST'])
 def auth():
     """Handle token submission."""
     token = request.form.get('token', '')
     next_url = request.form.get('next', '/')
 
-    if token == ACCESS_TOKEN:
+    if token_matches(token):
         response = make_response(redirect(next_url))
         response.set_cookie('tmux_token', token, httponly=True, samesite='Lax', max_age=86400*30)  # 30 days
         logger.info(f"Successful login from {request.remote_addr}")
@@ -210,24 +495,77 @@ def logout():
     response.delete_cookie('tmux_token')
     return response
 
+# index.html has no per-request context, so it is rendered on the first hit
+# and served from memory after that: (body, etag)
+_index_page = None
+
 @app.route('/')
 @token_required
 def index():
+    global _index_page
+    if _index_page is None:
+        body = render_template('index.html').encode()
+        _index_page = (body, hashlib.sha256(body).hexdigest()[:16])
+    body, etag = _index_page
+
+    # Revalidated on every load; an unchanged page is answered with a 304
+    response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.make_conditional(request)
+
     # Set cookie if authenticated via URL token (for convenience)
-    response = make_response(render_template('index.html'))
-    if request.args.get('token') == ACCESS_TOKEN:
-        response.set_cookie('tmux_token', ACCESS_TOKEN, httponly=True, samesite='Lax', max_age=86400*30)
+    if token_matches(request.args.get('token')):
+        response.set_cookie('tmux_token', access_token(), httponly=True, samesite='Lax', max_age=86400*30)
     return response
 
 # --- Group API ---
 
+# Body of every acknowledgement, encoded once
+OK_JSON = b'{"status":"ok"}'
+
+def ok_response():
+    """{'status': 'ok'} without building and serializing a dict per call."""
+    return Response(OK_JSON, mimetype='application/json')
+
+# Serialized GET bodies for the group and layout APIs, so clients polling
+# them share one SQLite read per second: {key: (body, expires_at)}.
+# Every write through the API clears the cache.
+API_CACHE_TTL = 1.0
+_api_cache = {}
+_api_cache_generation = 0
+
+def cached_json(f):
+    """Cache a view's JSON body for API_CACHE_TTL seconds, keyed by URL args."""
+    @wraps(f)
+    def decorated(**kwargs):
+        key = (request.endpoint,) + tuple(kwargs.values())
+        entry = _api_cache.get(key)
+        if entry and entry[1] > time.monotonic():
+            body = entry[0]
+        else:
+            generation = _api_cache_generation
+            body = f(**kwargs)
+            # Don't store a body read before a write that finished meanwhile
+            if generation == _api_cache_generation:
+                _api_cache[key] = (body, time.monotonic() + API_CACHE_TTL)
+        return Response(body, mimetype='application/json')
+    return decorated
+
+def invalidate_api_cache():
+    """Drop cached group/layout bodies after a write."""
+    global _api_cache_generation
+    _api_cache_generation += 1
+    _api_cache.clear()
+
 @app.route('/api/groups', methods=['GET'])
 @token_required
+@cached_json
 def get_groups():
     """List all groups."""
     groups = database.get_groups()
     active = database.get_active_group()
-    return jsonify({'groups': groups, 'activeGroup': active})
+    return json_dumps({'groups': groups, 'activeGroup': active})
 
 @app.route('/api/groups', methods=['POST'])
 @token_required
@@ -236,6 +574,7 @@ def create_group():
     data = request.get_json()
     name = data.get('name', 'New Group')
     group_id = database.create_group(name)
+    invalidate_api_cache()
     return jsonify({'id': group_id, 'name': name})
 
 @app.route('/api/groups/<int:group_id>', methods=['PUT'])
@@ -246,14 +585,16 @@ def update_group(group_id):
     name = data.get('name')
     if name:
         database.rename_group(group_id, name)
-    return jsonify({'status': 'ok'})
+        invalidate_api_cache()
+    return ok_response()
 
 @app.route('/api/groups/<int:group_id>', methods=['DELETE'])
 @token_required
 def delete_group(group_id):
     """Delete a group."""
     database.delete_group(group_id)
-    return jsonify({'status': 'ok'})
+    invalidate_api_cache()
+    return ok_response()
 
 @app.route('/api/groups/reorder', methods=['POST'])
 @token_required
@@ -262,7 +603,8 @@ def reorder_groups():
     data = request.get_json()
     group_ids = data.get('order', [])
     database.reorder_groups(group_ids)
-    return jsonify({'status': 'ok'})
+    invalidate_api_cache()
+    return ok_response()
 
 @app.route('/api/groups/active', methods=['POST'])
 @token_required
@@ -272,16 +614,18 @@ def set_active_group():
     group_id = data.get('groupId')
     if group_id is not None:
         database.set_active_group(group_id)
-    return jsonify({'status': 'ok'})
+        invalidate_api_cache()
+    return ok_response()
 
 # --- Layout API (per group) ---
 
 @app.route('/api/groups/<int:group_id>/layout', methods=['GET'])
 @token_required
+@cached_json
 def get_group_layout(group_id):
     """Get saved layout for a group."""
-    layout = database.get_layout(group_id)
-    return jsonify(layout or {})
+    # Stored JSON is already serialized; send it without a decode/encode pass
+    return database.get_layout_raw(group_id) or '{}'
 
 @app.route('/api/groups/<int:group_id>/layout', methods=['POST'])
 @token_required
@@ -290,75 +634,126 @@ def save_group_layout(group_id):
     data = request.get_json()
     if data:
         database.save_layout(group_id, data)
-    return jsonify({'status': 'ok'})
+        invalidate_api_cache()
+    return ok_response()
 
 @app.route('/api/groups/<int:group_id>/layout', methods=['DELETE'])
 @token_required
 def delete_group_layout(group_id):
     """Delete layout for a group."""
     database.delete_layout(group_id)
-    return jsonify({'status': 'ok'})
+    invalidate_api_cache()
+    return ok_response()
 
 # --- Tmux Sessions API ---
 
-@app.route('/api/sessions')
-@token_required
-def get_sessions():
-    """List all tmux sessions."""
+# Short-lived cache so polling clients don't fork tmux on every request:
+# {key: (value, expires_at)}
+TMUX_CACHE_TTL = 1.0
+_tmux_cache = {}
+_tmux_cache_lock = threading.Lock()
+
+def cached_tmux_query(key, query):
+    """Return query(), reusing a successful result for TMUX_CACHE_TTL seconds."""
+    entry = _tmux_cache.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+
+    # Serialize misses so concurrent requests share one tmux call
+    with _tmux_cache_lock:
+        entry = _tmux_cache.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        value = query()
+        if value is not None:
+            _tmux_cache[key] = (value, time.monotonic() + TMUX_CACHE_TTL)
+        return value
+
+def invalidate_tmux_cache():
+    """Drop cached tmux results, e.g. after a terminal may have created a session."""
+    _tmux_cache.clear()
+
+def tmux_lines(args):
+    """Run a tmux command and return its output lines, or None on failure.
+
+    Uses the persistent control-mode client, falling back to running tmux
+    directly if the client can't be started or has died.
+    """
     try:
-        result = subprocess.run(
-            ['tmux', 'list-sessions', '-F', '#{session_name}:#{session_windows}:#{session_attached}'],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.returncode != 0:
-            print(f"tmux list-sessions failed: {result.stderr}")
-            return jsonify([])
+        lines = tmux_control.run(args)
+    except OSError as e:
+        logger.warning(f"tmux control client unavailable: {e}")
+    else:
+        if lines is None:
+            return None
+        return [line.decode('utf-8', 'replace') for line in lines]
+
+    result = subprocess.run(('tmux',) + args, capture_output=True, timeout=5)
+    if result.returncode != 0:
+        logger.warning(f"tmux {args[0]} failed: {result.stderr.decode('utf-8', 'replace')}")
+        return None
+    # Decode once and split once
+    return result.stdout.decode('utf-8', 'replace').splitlines()
+
+def query_sessions():
+    """Run tmux list-sessions. Returns None on failure."""
+    try:
+        lines = tmux_lines(('list-sessions', '-F', '#{session_name}:#{session_windows}:#{session_attached}'))
+        if lines is None:
+            return None
 
+        # name:windows:attached; blank lines have no second separator
         sessions = []
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
-            parts = line.split(':')
-            if len(parts) >= 3:
+        for line in lines:
+            name, _, rest = line.partition(':')
+            windows, sep, attached = rest.partition(':')
+            if sep and name != tmux_control.CONTROL_SESSION:
                 sessions.append({
-                    'name': parts[0],
-                    'windows': int(parts[1]),
-                    'attached': parts[2] == '1'
+                    'name': name,
+                    'windows': int(windows),
+                    'attached': attached == '1'
                 })
-        return jsonify(sessions)
+        return sessions
     except subprocess.TimeoutExpired:
-        print("tmux list-sessions timed out")
-        return jsonify([])
+        logger.warning("tmux list-sessions timed out")
+        return None
     except Exception as e:
-        print(f"Error listing sessions: {e}")
-        return jsonify([])
+        logger.error(f"Error listing sessions: {e}")
+        return None
 
-@app.route('/api/sessions/<session>/windows')
-@token_required
-def get_windows(session):
-    """List windows in a tmux session."""
+def query_windows(session):
+    """Run tmux list-windows for a session. Returns None on failure."""
     try:
-        result = subprocess.run(
-            ['tmux', 'list-windows', '-t', session, '-F', '#{window_index}:#{window_name}'],
-            capture_output=True, text=True
-        )
-        if result.returncode != 0:
-            return jsonify([])
+        lines = tmux_lines(('list-windows', '-t', session, '-F', '#{window_index}:#{window_name}'))
+        if lines is None:
+            return None
 
         windows = []
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
-            parts = line.split(':', 1)
-            if len(parts) >= 2:
+        for line in lines:
+            index, sep, name = line.partition(':')
+            if sep:
                 windows.append({
-                    'index': int(parts[0]),
-                    'name': parts[1]
+                    'index': int(index),
+                    'name': name
                 })
-        return jsonify(windows)
+        return windows
     except Exception as e:
-        print(f"Error listing windows: {e}")
-        return jsonify([])
+        logger.error(f"Error listing windows: {e}")
+        return None
+
+@app.route('/api/sessions')
+@token_required
+def get_sessions():
+    """List all tmux sessions."""
+    sessions = cached_tmux_query(('sessions',), query_sessions)
+    return jsonify(sessions or [])
+
+@app.route('/api/sessions/<session>/windows')
+@token_required
+def get_windows(session):
+    """List windows in a tmux session."""
+    windows = cached_tmux_query(('windows', session), lambda: query_windows(session))
+    return jsonify(windows or [])
 
 # --- Socket.IO Events ---
 
@@ -366,18 +761,16 @@ def get_windows(session):
 def on_connect():
     # Check token from cookie (Socket.IO sends cookies with handshake)
     if TOKEN_ENABLED:
-        token = request.cookies.get('tmux_token')
-        if token != ACCESS_TOKEN:
+        if not token_matches(request.cookies.get('tmux_token')):
             logger.warning(f"Socket.IO connection rejected - invalid token from {request.remote_addr}")
             disconnect()
             return False
     logger.info(f"Client connected: {request.sid}")
-    print(f"Client connected: {request.sid}")
 
 @socketio.on('disconnect')
 def on_disconnect():
     sid = request.sid
-    print(f"Client disconnected: {sid}")
+    logger.info(f"Client disconnected: {sid}")
     cleanup_terminal(sid)
 
 @socketio.on('open_terminal')
@@ -389,49 +782,36 @@ def on_open_terminal(data):
     session = data.get('session')
     window = data.get('window', 0)
 
-    print(f"open_terminal: sid={sid}, termId={term_id}, type={terminal_type}")
+    logger.debug(f"open_terminal: sid={sid}, termId={term_id}, type={terminal_type}")
 
     # Clean up existing terminal with same termId
     cleanup_terminal(sid, term_id)
 
-    # Initialize sid dict if needed
-    if sid not in terminals:
-        terminals[sid] = {}
+    # A tmux attach may create or change sessions
+    invalidate_tmux_cache()
 
     try:
+        if terminal_type == 'tmux' and session:
+            argv = ['tmux', 'attach-session', '-t', f'{session}:{window}']
+        else:
+            # Spawn bash with login shell for proper env
+            shell = os.environ.get('SHELL', '/bin/bash')
+            argv = [shell, '-l']
+
         # Create PTY
-        pid, fd = pty.fork()
+        pid, fd = spawn_pty(argv)
+        # Set non-blocking
+        os.set_blocking(fd, False)
 
-        if pid == 0:
-            # Child process
-            os.environ['TERM'] = 'xterm-256color'
-            if terminal_type == 'tmux' and session:
-                os.execlp('tmux', 'tmux', 'attach-session', '-t', f'{session}:{window}')
-            else:
-                # Spawn bash with login shell for proper env
-                shell = os.environ.get('SHELL', '/bin/bash')
-                os.execlp(shell, shell, '-l')
-        else:
-            # Parent process
-            # Set non-blocking
-            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
-
-            terminals[sid][term_id] = {
-                'fd': fd,
-                'pid': pid,
-                'type': terminal_type,
-                'session': session,
-                'window': window
-            }
+        terminals[sid, term_id] = Terminal(fd, pid, terminal_type, session, window)
 
-            # Start reading from PTY
-            socketio.start_background_task(read_pty, sid, term_id, fd)
-            emit('terminal_ready', {'status': 'ok', 'termId': term_id})
-            print(f"Terminal ready: sid={sid}, termId={term_id}")
+        # Start reading from PTY
+        watch_pty(sid, term_id, fd)
+        emit('terminal_ready', {'status': 'ok', 'termId': term_id})
+        logger.debug(f"Terminal ready: sid={sid}, termId={term_id}")
 
     except Exception as e:
-        print(f"Error opening terminal: {e}")
+        logger.error(f"Error opening terminal: {e}")
         emit('terminal_error', {'error': str(e), 'termId': term_id})
 
 @socketio.on('terminal_input')
@@ -441,14 +821,15 @@ def on_terminal_input(data):
     term_id = data.get('termId', 'default') if isinstance(data, dict) else 'default'
     input_data = data.get('data', data) if isinstance(data, dict) else data
 
-    if sid not in terminals or term_id not in terminals[sid]:
+    terminal = terminals.get((sid, term_id))
+    if terminal is None:
         return
 
-    fd = terminals[sid][term_id]['fd']
-    try:
-        os.write(fd, input_data.encode('utf-8'))
-    except Exception as e:
-        print(f"Error writing to PTY: {e}")
+    # Pastes arrive as bytes (a binary attachment) and are written as is;
+    # keystrokes arrive as text
+    if isinstance(input_data, str):
+        input_data = input_data.encode('utf-8')
+    queue_input(terminal, input_data)
 
 @socketio.on('terminal_resize')
 def on_terminal_resize(data):
@@ -456,82 +837,324 @@ def on_terminal_resize(data):
     sid = request.sid
     term_id = data.get('termId', 'default')
 
-    if sid not in terminals or term_id not in terminals[sid]:
+    terminal = terminals.get((sid, term_id))
+    if terminal is None:
         return
 
-    fd = terminals[sid][term_id]['fd']
-    rows = data.get('rows', 24)
-    cols = data.get('cols', 80)
-
+    terminal.want_geom = (data.get('rows', 24), data.get('cols', 80))
+    if not terminal.resize_timer:
+        # Apply the first size of a burst now, then at most once per
+        # RESIZE_DELAY, always with the latest size
+        apply_resize(terminal)
+        terminal.resize_timer = True
+        socketio.start_background_task(delayed_resize, terminal)
+
+def delayed_resize(terminal):
+    """Background task: apply the size requested during RESIZE_DELAY."""
+    socketio.sleep(RESIZE_DELAY)
+    terminal.resize_timer = False
+    apply_resize(terminal)
+
+def apply_resize(terminal):
+    """Set the PTY to the last requested size, unless it already has it."""
+    geom = terminal.want_geom
+    # xterm.js re-sends the same size on focus/layout ticks; each ioctl
+    # would SIGWINCH the shell or tmux into a full redraw
+    if geom is None or geom == terminal.geom:
+        return
     try:
-        winsize = struct.pack('HHHH', rows, cols, 0, 0)
-        fcntl.ioctl(fd, termios.TIOCSWINSZ, winsize)
+        winsize = struct.pack('HHHH', geom[0], geom[1], 0, 0)
+        fcntl.ioctl(terminal.fd, termios.TIOCSWINSZ, winsize)
+        terminal.geom = geom
     except Exception as e:
-        print(f"Error resizing PTY: {e}")
+        logger.error(f"Error resizing PTY: {e}")
 
-def read_pty(sid, term_id, fd):
-    """Background task to read from PTY and send to client."""
-    while sid in terminals and term_id in terminals[sid] and terminals[sid][term_id]['fd'] == fd:
-        try:
-            ready, _, _ = select.select([fd], [], [], 0.1)
-            if ready:
-                try:
-                    data = os.read(fd, 4096)
-                    if data:
-                        socketio.emit('terminal_output', {
-                            'termId': term_id,
-                            'data': data.decode('utf-8', errors='replace')
-                        }, to=sid)
-                    else:
-                        # EOF
-                        break
-                except OSError:
-                    break
-        except Exception as e:
-            print(f"Error reading from PTY: {e}")
-            break
-
-    # Terminal closed
-    socketio.emit('terminal_closed', {'termId': term_id}, to=sid)
-    cleanup_terminal(sid, term_id)
+def spawn_pty(argv):
+    """Run argv on a new PTY as a session leader. Returns (pid, master_fd)."""
+    env = dict(os.environ, TERM='xterm-256color')
+    if not USE_POSIX_SPAWN or READER_CPU is not None:
+        pid, fd = pty.fork()
+        if pid == 0:
+            # Child process
+            try:
+                if READER_CPU is not None and _HAS_AFFINITY:
+                    os.sched_setaffinity(0, _default_cpus)
+                os.execvpe(argv[0], argv, env)
+            finally:
+                os._exit(127)
+        return pid, fd
+
+    master_fd, slave_fd = os.openpty()
+    try:
+        # setsid() runs before the file actions, so opening the slave by
+        # path makes it the child's controlling terminal
+        pid = os.posix_spawnp(argv[0], argv, env, file_actions=[
+            (os.POSIX_SPAWN_OPEN, 0, os.ttyname(slave_fd), os.O_RDWR, 0),
+            (os.POSIX_SPAWN_DUP2, 0, 1),
+            (os.POSIX_SPAWN_DUP2, 0, 2),
+        ], setsid=True, setsigdef=(signal.SIGPIPE, signal.SIGXFSZ))
+    except BaseException:
+        os.close(master_fd)
+        raise
+    finally:
+        # The child has its own descriptors; both openpty fds are close-on-exec
+        os.close(slave_fd)
+    return pid, master_fd
+
+def queue_input(terminal, data):
+    """Buffer input for a terminal; control keys and large pastes flush at once."""
+    with terminal.in_lock:
+        terminal.in_chunks.append(data)
+        terminal.in_size += len(data)
+        if (terminal.in_size >= INPUT_FLUSH_SIZE
+                or len(terminal.in_chunks) >= INPUT_FLUSH_CHUNKS
+                or (len(data) == 1 and data[0] < 0x20)):
+            flush_input(terminal)
+        elif not terminal.in_timer:
+            terminal.in_timer = True
+            socketio.start_background_task(delayed_flush, terminal)
+
+def delayed_flush(terminal):
+    """Background task: flush whatever input arrived during INPUT_FLUSH_DELAY."""
+    socketio.sleep(INPUT_FLUSH_DELAY)
+    with terminal.in_lock:
+        terminal.in_timer = False
+        flush_input(terminal)
+
+def flush_input(terminal):
+    """Write all pending input with a single writev(); requeue any short write.
+
+    The caller holds terminal.in_lock.
+    """
+    chunks = terminal.in_chunks
+    if not chunks:
+        return
+    try:
+        # Gathered write: the chunks are never joined into one buffer
+        written = raw_os.writev(terminal.fd, chunks)
+    except BlockingIOError:
+        written = 0
+    except OSError as e:
+        logger.error(f"Error writing to PTY: {e}")
+        chunks.clear()
+        terminal.in_size = 0
+        return
 
-def cleanup_terminal(sid, term_id=None):
-    """Clean up terminal resources. If term_id is None, clean all for sid."""
-    if sid not in terminals:
+    if written == terminal.in_size:
+        chunks.clear()
+        terminal.in_size = 0
         return
 
-    if term_id is not None:
-        # Clean specific terminal
-        terminal = terminals[sid].pop(term_id, None)
-        if terminal:
-            try:
-                os.close(terminal['fd'])
-            except:
-                pass
+    # PTY input buffer is full: keep the unwritten tail and retry shortly
+    rest = b''.join(chunks)[written:]
+    chunks[:] = [rest]
+    terminal.in_size = len(rest)
+    if not terminal.in_timer:
+        terminal.in_timer = True
+        socketio.start_background_task(delayed_flush, terminal)
+
+def watch_pty(sid, term_id, fd):
+    """Hand a PTY fd to the reactor thread, starting it on first use."""
+    global _reactor_started
+    with _watch_lock:
+        _watched[fd] = (sid, term_id)
+        if USE_EVENTLET:
+            hub = eventlet.hubs.get_hub()
+            _hub_listeners[fd] = hub.add(hub.READ, fd, on_pty_readable, ignore, ignore)
+        else:
+            selector.register(fd, selectors.EVENT_READ)
+    with _reactor_lock:
+        if not _reactor_started:
+            _reactor_started = True
+            socketio.start_background_task(pty_reactor)
+    wake_reactor()
+
+def unwatch_pty(fd):
+    """Stop reading from a PTY fd. Must run before the fd is closed."""
+    # Output staged for a closed or replaced terminal is dropped, so it can't
+    # be sent under a reused fd number
+    with _watch_lock:
+        _pending_output.pop(fd, None)
+        _output_decoders.pop(fd, None)
+        if _watched.pop(fd, None) is None:
+            return
+        if USE_EVENTLET:
+            # Takes effect at once; no wakeup needed
+            eventlet.hubs.get_hub().remove(_hub_listeners.pop(fd))
+            # A wakeup still queued for it must not be read under a reused fd
+            _ready_fds.discard(fd)
+            return
+        selector.unregister(fd)
+    # Let a blocked select() drop the fd now rather than when it's closed
+    wake_reactor()
+
+def on_pty_readable(fd):
+    """Hub callback: note that fd is readable and wake the reactor.
+
+    Runs on the hub greenlet, so it must not block or switch.
+    """
+    _ready_fds.add(fd)
+    if not _ready_event.ready():
+        _ready_event.send()
+
+def ignore(*args):
+    """Hub close notifications: unwatch_pty always runs before a PTY is closed."""
+
+def wake_reactor():
+    """Make the reactor's current select() return so it sees fd changes."""
+    if USE_EVENTLET:
+        return  # The hub picks up added and removed listeners by itself
+    try:
+        raw_os.write(_wakeup_w, b'\0')
+    except BlockingIOError:
+        pass  # Reactor already has a wakeup pending
+
+def wait_ready(timeout):
+    """Block until some PTY is readable or timeout passes; returns the readable fds."""
+    global _ready_event
+    if not USE_EVENTLET:
+        ready = []
+        for key, _ in selector.select(timeout):
+            if key.fd == _wakeup_r:
+                try:
+                    raw_os.read(_wakeup_r, 4096)
+                except BlockingIOError:
+                    pass
+            else:
+                ready.append(key.fd)
+        return ready
+    if not _ready_fds:
+        _ready_event.wait(timeout)
+    # The hub keeps reporting an fd for as long as it stays readable, so a
+    # fresh event per wait is enough to avoid missed wakeups
+    _ready_event = eventlet.event.Event()
+    ready = list(_ready_fds)
+    _ready_fds.clear()
+    return ready
+
+def pin_reader():
+    """Pin the reactor's thread to READER_CPU so the output path keeps a warm cache."""
+    if READER_CPU is None:
+        return
+    if not _HAS_AFFINITY:
+        logger.warning("--reader-cpu is not supported on this platform")
+        return
+    try:
+        os.sched_setaffinity(0, {READER_CPU})
+    except (ValueError, OSError) as e:
+        logger.error(f"Error pinning to CPU {READER_CPU}: {e}")
+
+def pty_reactor():
+    """Background task: block until any PTY is readable and forward its output."""
+    pin_reader()
+    while True:
+        # Sleep until the next staged batch is due, or indefinitely if none
+        # (list() snapshots the dict in one step, even with --threading)
+        flush_times = [pending[3] for pending in list(_pending_output.values())]
+        timeout = max(0, min(flush_times) - time.monotonic()) if flush_times else None
+        ready = wait_ready(timeout)
+
+        # Read every ready PTY before emitting anything, so no terminal's
+        # output waits in the kernel behind another terminal's emit
+        closed = []
+        for fd in ready:
+            target = _watched.get(fd)
+            if target is None:
+                continue
+            pending = _pending_output.get(fd)
+            if pending is None:
+                sid, term_id = target
+                pending = [sid, term_id, bytearray(), 0]
             try:
-                os.kill(terminal['pid'], signal.SIGTERM)
-            except:
-                pass
-        # Remove sid if no more terminals
-        if not terminals[sid]:
-            del terminals[sid]
+                got, alive = read_batch(fd, pending[2], OUTPUT_BATCH_SIZE - len(pending[2]))
+            except Exception as e:
+                logger.error(f"Error reading from PTY: {e}")
+                got, alive = 0, False
+            if got and fd not in _pending_output:
+                pending[3] = time.monotonic() + OUTPUT_FLUSH_DELAY
+                with _watch_lock:
+                    # Skip it if the fd was dropped (or reused) during the read
+                    if _watched.get(fd) is target:
+                        _pending_output[fd] = pending
+            if not alive:
+                closed.append((fd, target))
+
+        now = time.monotonic()
+        for fd, pending in list(_pending_output.items()):
+            if len(pending[2]) >= OUTPUT_BATCH_SIZE or pending[3] <= now:
+                flush_output(fd)
+
+        for fd, (sid, term_id) in closed:
+            flush_output(fd)
+            # EOF: unless the terminal was already closed or replaced
+            unwatch_pty(fd)
+            terminal = terminals.get((sid, term_id))
+            if terminal is not None and terminal.fd == fd:
+                socketio.emit('terminal_closed', {'termId': term_id}, to=sid)
+                cleanup_terminal(sid, term_id)
+
+def flush_output(fd):
+    """Emit the output staged for a PTY, if any."""
+    pending = _pending_output.pop(fd, None)
+    if pending is None:
+        return
+    sid, term_id, data, _ = pending
+    if LEGACY_JSON_OUTPUT:
+        decoder = _output_decoders.get(fd)
+        if decoder is None:
+            decoder = _output_decoders[fd] = utf8_decoder('replace')
+        data = decoder.decode(data)
     else:
-        # Clean all terminals for sid
-        for tid, terminal in list(terminals[sid].items()):
-            try:
-                os.close(terminal['fd'])
-            except:
-                pass
+        # Raw bytes go out as a binary frame; xterm.js decodes UTF-8 itself
+        data = bytes(data)
+    socketio.emit('terminal_output', {
+        'termId': term_id,
+        'data': data
+    }, to=sid)
+
+def read_batch(fd, out, limit=OUTPUT_BATCH_SIZE):
+    """Drain a non-blocking PTY fd, up to limit bytes, onto the bytearray out.
+
+    Returns (count, alive); alive is False once the PTY hit EOF or an error.
+    """
+    view = memoryview(_read_buf)
+    n = 0
+    alive = True
+    try:
+        while n < limit:
             try:
-                os.kill(terminal['pid'], signal.SIGTERM)
-            except:
-                pass
-        del terminals[sid]
+                # Read straight into the shared buffer, no per-read bytes object
+                got = raw_os.readv(fd, [view[n:min(n + OUTPUT_READ_SIZE, limit)]])
+            except BlockingIOError:
+                break
+            except OSError:
+                alive = False
+                break
+            if not got:
+                alive = False
+                break
+            n += got
+        # Appended straight from the read buffer, without a bytes in between
+        out += view[:n]
+        return n, alive
+    finally:
+        view.release()
+
+def cleanup_terminal(sid, term_id=None):
+    """Clean up terminal resources. If term_id is None, clean all for sid."""
+    if term_id is not None:
+        keys = [(sid, term_id)]
+    else:
+        keys = [key for key in list(terminals) if key[0] == sid]
+    for key in keys:
+        terminal = terminals.pop(key, None)
+        if terminal is not None:
+            terminal.close()
 
 def main():
     """Main entry point for tmux-workspace command."""
     import argparse
-    global TOKEN_ENABLED
+    global TOKEN_ENABLED, LEGACY_JSON_OUTPUT, READER_CPU
 
     parser = argparse.ArgumentParser(
         prog='tmux-workspace',
@@ -543,15 +1166,26 @@ def main():
                         help='Host to bind to (default: 0.0.0.0)')
     parser.add_argument('--no-token', action='store_true',
                         help='Disable access token authentication')
+    parser.add_argument('--threading', action='store_true',
+                        help='Use OS threads and the Werkzeug server instead of eventlet')
+    parser.add_argument('--legacy-json', action='store_true',
+                        help='Send terminal output as text instead of binary frames')
+    parser.add_argument('--reader-cpu', type=int, metavar='CPU',
+                        help='Pin the PTY reader to this CPU core (Linux only)')
     parser.add_argument('--version', '-v', action='version',
                         version='%(prog)s 2.0.0')
     args = parser.parse_args()
+    if args.threading and USE_EVENTLET:
+        parser.error('--threading must be known before import; '
+                     'run tmux-workspace or python -m tmux_workspace')
 
     # Set up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, handle_shutdown)
 
     # Set token enabled flag
     TOKEN_ENABLED = not args.no_token
+    LEGACY_JSON_OUTPUT = args.legacy_json
+    READER_CPU = args.reader_cpu
 
     # Print startup banner
     print("\n" + "=" * 60)
@@ -561,19 +1195,25 @@ def main():
     print(f"    http://localhost:{args.port}/")
     print(f"    http://127.0.0.1:{args.port}/")
     if not args.no_token:
-        print(f"\n  Access token: {ACCESS_TOKEN}")
+        print(f"\n  Access token: {access_token()}")
         print(f"\n  Or open:")
-        print(f"    http://localhost:{args.port}/?token={ACCESS_TOKEN}")
+        print(f"    http://localhost:{args.port}/?token={access_token()}")
     print(f"\n  Log file: {LOG_FILE}")
     print("\n  Press Ctrl+C twice to stop the server")
     print("=" * 60 + "\n")
 
     logger.info(f"Server starting on {args.host}:{args.port}")
     if not args.no_token:
-        logger.info(f"Access token: {ACCESS_TOKEN}")
+        logger.info(f"Access token: {access_token()}")
+
+    # Start the tmux control client now rather than on the first page load
+    socketio.start_background_task(cached_tmux_query, ('sessions',), query_sessions)
 
     # Run with debug=False to prevent double signal handlers
-    socketio.run(app, host=args.host, port=args.port, debug=False, allow_unsafe_werkzeug=True)
+    if USE_EVENTLET:
+        socketio.run(app, host=args.host, port=args.port, debug=False)
+    else:
+        socketio.run(app, host=args.host, port=args.port, debug=False, allow_unsafe_werkzeug=True)
 
 
 if __name__ == '__main__':
@@ -1,164 +1,208 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import atexit
+import threading
+import time
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'terminals.db')
 
+# One connection for the life of the process, so each call reuses the open
+# file, page cache and sqlite3's statement cache. Under eventlet every
+# request is a green thread, so per-thread connections would never be reused.
+# _lock serializes statements; `with conn:` makes each write one transaction.
+_conn = None
+_lock = threading.RLock()
+
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    global _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            _conn = conn
+        return _conn
+
+@atexit.register
+def close_connection():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+# Timestamps have one-second resolution: the formatted UTC time is reused
+# until the second changes. A tuple, so a reader never sees half an update.
+_now_cache = (0, '')
+
+def _now_iso():
+    global _now_cache
+    t = int(time.time())
+    cached_t, text = _now_cache
+    if cached_t != t:
+        text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t))
+        _now_cache = (t, text)
+    return text
+
+SETTINGS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID
+'''
 
 def init_db():
-    conn = get_connection()
-
-    # Groups table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            position INTEGER NOT NULL DEFAULT 0,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-    ''')
-
-    # Layouts table (now linked to groups)
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS layouts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            group_id INTEGER NOT NULL,
-            config TEXT NOT NULL,
-            updated_at TEXT NOT NULL,
-            FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+    with _lock, get_connection() as conn:
+        # Groups table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS groups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                position INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_groups_position ON groups(position)'
         )
-    ''')
 
-    # Active group tracking
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL
+        # Layouts table (now linked to groups)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS layouts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id INTEGER NOT NULL,
+                config TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+            )
+        ''')
+
+        # One layout per group, so save_layout can upsert. Tables created
+        # before this index may hold duplicates: keep the newest row.
+        conn.execute('''
+            DELETE FROM layouts WHERE id NOT IN (
+                SELECT MAX(id) FROM layouts GROUP BY group_id
+            )
+        ''')
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_layouts_group ON layouts(group_id)'
         )
-    ''')
 
-    conn.commit()
-    conn.close()
+        # Active group tracking. WITHOUT ROWID: rows live in the primary key
+        # b-tree, so a lookup by key is one probe instead of two.
+        conn.execute(SETTINGS_TABLE_SQL.format(name='settings'))
+
+        # Databases from before WITHOUT ROWID: rebuild the table once
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'settings'"
+        ).fetchone()[0]
+        if 'WITHOUT ROWID' not in sql.upper():
+            conn.execute('DROP TABLE IF EXISTS settings_new')
+            conn.execute(SETTINGS_TABLE_SQL.format(name='settings_new'))
+            conn.execute('INSERT INTO settings_new (key, value) SELECT key, value FROM settings')
+            conn.execute('DROP TABLE settings')
+            conn.execute('ALTER TABLE settings_new RENAME TO settings')
 
 # --- Group operations ---
 
+# Columns returned by get_groups, in SELECT order
+_GROUP_COLS = ('id', 'name', 'position', 'created_at', 'updated_at')
+_GROUPS_SQL = f"SELECT {', '.join(_GROUP_COLS)} FROM groups ORDER BY position"
+
 def get_groups():
-    conn = get_connection()
-    rows = conn.execute('SELECT * FROM groups ORDER BY position').fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    with _lock:
+        cursor = get_connection().cursor()
+        cursor.row_factory = None  # plain tuples; keys come from _GROUP_COLS
+        rows = cursor.execute(_GROUPS_SQL).fetchall()
+    return [dict(zip(_GROUP_COLS, row)) for row in rows]
 
 def create_group(name):
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
-
-    # Get next position
-    max_pos = conn.execute('SELECT MAX(position) FROM groups').fetchone()[0]
-    position = (max_pos or 0) + 1
-
-    cursor = conn.execute(
-        'INSERT INTO groups (name, position, created_at, updated_at) VALUES (?, ?, ?, ?)',
-        (name, position, now, now)
-    )
-    group_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return group_id
+    now = _now_iso()
+
+    with _lock, get_connection() as conn:
+        # Get next position
+        max_pos = conn.execute('SELECT MAX(position) FROM groups').fetchone()[0]
+        position = (max_pos or 0) + 1
+
+        cursor = conn.execute(
+            'INSERT INTO groups (name, position, created_at, updated_at) VALUES (?, ?, ?, ?)',
+            (name, position, now, now)
+        )
+    return cursor.lastrowid
 
 def rename_group(group_id, new_name):
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
-    conn.execute(
-        'UPDATE groups SET name = ?, updated_at = ? WHERE id = ?',
-        (new_name, now, group_id)
-    )
-    conn.commit()
-    conn.close()
+    now = _now_iso()
+    with _lock, get_connection() as conn:
+        conn.execute(
+            'UPDATE groups SET name = ?, updated_at = ? WHERE id = ?',
+            (new_name, now, group_id)
+        )
 
 def delete_group(group_id):
-    conn = get_connection()
-    conn.execute('DELETE FROM layouts WHERE group_id = ?', (group_id,))
-    conn.execute('DELETE FROM groups WHERE id = ?', (group_id,))
-    conn.commit()
-    conn.close()
+    with _lock, get_connection() as conn:
+        conn.execute('DELETE FROM layouts WHERE group_id = ?', (group_id,))
+        conn.execute('DELETE FROM groups WHERE id = ?', (group_id,))
 
 def reorder_groups(group_ids):
     """Update positions based on new order."""
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
-    for i, gid in enumerate(group_ids):
-        conn.execute(
+    now = _now_iso()
+    rows = [(i, now, gid) for i, gid in enumerate(group_ids)]
+    with _lock, get_connection() as conn:
+        conn.executemany(
             'UPDATE groups SET position = ?, updated_at = ? WHERE id = ?',
-            (i, now, gid)
+            rows
         )
-    conn.commit()
-    conn.close()
 
 # --- Layout operations (per group) ---
 
 def save_layout(group_id, config):
-    conn = get_connection()
-    now = datetime.utcnow().isoformat()
+    now = _now_iso()
     config_json = json.dumps(config)
 
-    # Check if layout exists for this group
-    existing = conn.execute(
-        'SELECT id FROM layouts WHERE group_id = ?', (group_id,)
-    ).fetchone()
-
-    if existing:
-        conn.execute(
-            'UPDATE layouts SET config = ?, updated_at = ? WHERE group_id = ?',
-            (config_json, now, group_id)
-        )
-    else:
-        conn.execute(
-            'INSERT INTO layouts (group_id, config, updated_at) VALUES (?, ?, ?)',
-            (group_id, config_json, now)
-        )
-
-    conn.commit()
-    conn.close()
+    with _lock, get_connection() as conn:
+        conn.execute('''
+            INSERT INTO layouts (group_id, config, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(group_id) DO UPDATE SET
+                config = excluded.config,
+                updated_at = excluded.updated_at
+        ''', (group_id, config_json, now))
+
+def get_layout_raw(group_id):
+    """Return the stored layout JSON without decoding it, or None."""
+    with _lock:
+        row = get_connection().execute(
+            'SELECT config FROM layouts WHERE group_id = ?', (group_id,)
+        ).fetchone()
+    return row['config'] if row else None
 
 def get_layout(group_id):
-    conn = get_connection()
-    row = conn.execute(
-        'SELECT config FROM layouts WHERE group_id = ?', (group_id,)
-    ).fetchone()
-    conn.close()
-
-    if row:
-        return json.loads(row['config'])
+    raw = get_layout_raw(group_id)
+    if raw:
+        return json.loads(raw)
     return None
 
 def delete_layout(group_id):
-    conn = get_connection()
-    conn.execute('DELETE FROM layouts WHERE group_id = ?', (group_id,))
-    conn.commit()
-    conn.close()
+    with _lock, get_connection() as conn:
+        conn.execute('DELETE FROM layouts WHERE group_id = ?', (group_id,))
 
 # --- Settings ---
 
 def get_setting(key, default=None):
-    conn = get_connection()
-    row = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
-    conn.close()
+    with _lock:
+        row = get_connection().execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
     return row['value'] if row else default
 
 def set_setting(key, value):
-    conn = get_connection()
-    conn.execute(
-        'INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = ?',
-        (key, value, value)
-    )
-    conn.commit()
-    conn.close()
+    with _lock, get_connection() as conn:
+        conn.execute(
+            'INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = ?',
+            (key, value, value)
+        )
 
 def get_active_group():
     val = get_setting('active_group')
@@ -0,0 +1,154 @@
+import atexit
+import os
+import select
+import socket
+import subprocess
+import threading
+
+# A tmux control-mode client (tmux -C) kept open for the life of the process,
+# so queries are a line written to a pipe instead of a fork+exec of tmux.
+# The client attaches to its own session, created on first use and marked
+# destroy-unattached so tmux removes it as soon as the client goes away.
+CONTROL_SESSION = '__ctl__'
+READ_TIMEOUT = 2  # seconds to wait for a reply before giving up on the client
+
+# Encoded command lines by argv tuple, so repeated queries skip the quoting
+COMMAND_CACHE_SIZE = 256
+_command_lines = {}
+
+_proc = None
+_buf = b''
+_lock = threading.Lock()
+
+def quote(arg):
+    """Quote one argument for tmux's command parser."""
+    return "'" + arg.replace("'", "'\\''") + "'"
+
+def run(args):
+    """Run one tmux command (argv without 'tmux') over the control client.
+
+    Returns the output lines as bytes, or None if tmux reported an error or
+    no tmux server is running (a query never starts one). Raises OSError if
+    the client is unavailable, so callers can fall back to running tmux
+    directly.
+    """
+    line = _command_lines.get(args)
+    if line is None:
+        text = ' '.join(map(quote, args))
+        if '\n' in text:
+            raise OSError('newline in tmux argument')
+        line = text.encode() + b'\n'
+        if len(_command_lines) < COMMAND_CACHE_SIZE:
+            _command_lines[args] = line
+    with _lock:
+        if (_proc is None or _proc.poll() is not None) and not _server_running():
+            return None
+        proc = _get_client()
+        try:
+            os.write(proc.stdin.fileno(), line)
+            return _read_reply(proc)
+        except OSError:
+            _close_client()
+            raise
+
+def _get_client():
+    global _proc, _buf
+    if _proc is not None and _proc.poll() is None:
+        return _proc
+    _close_client()
+    _proc = subprocess.Popen(
+        ['tmux', '-C', 'new-session', '-A', '-s', CONTROL_SESSION,
+         ';', 'set-option', '-t', CONTROL_SESSION, 'destroy-unattached', 'on'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    _buf = b''
+    try:
+        # Each command on the tmux command line is answered with an empty
+        # %begin/%end block
+        _read_reply(_proc)
+        _read_reply(_proc)
+    except OSError:
+        _close_client()
+        raise
+    return _proc
+
+def _server_running():
+    """Whether a tmux server is listening on the default socket."""
+    # Same lookup as tmux: the socket of the enclosing session, if any
+    path = os.environ.get('TMUX', '').split(',')[0]
+    if not path:
+        tmpdir = os.environ.get('TMUX_TMPDIR') or '/tmp'
+        path = os.path.join(tmpdir, f'tmux-{os.getuid()}', 'default')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
+
+@atexit.register
+def close():
+    """Shut down the control client and remove its session."""
+    global _proc
+    with _lock:
+        if _proc is None:
+            return
+        proc, _proc = _proc, None
+        try:
+            os.write(proc.stdin.fileno(),
+                     f'kill-session -t {quote(CONTROL_SESSION)}\n'.encode())
+        except OSError:
+            pass
+        # EOF on stdin also makes the client detach and exit
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=READ_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+def _close_client():
+    global _proc
+    if _proc is None:
+        return
+    proc, _proc = _proc, None
+    proc.stdin.close()
+    proc.stdout.close()
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+def _read_line(proc):
+    global _buf
+    fd = proc.stdout.fileno()
+    while True:
+        end = _buf.find(b'\n')
+        if end >= 0:
+            line, _buf = _buf[:end], _buf[end + 1:]
+            return line
+        ready, _, _ = select.select([fd], [], [], READ_TIMEOUT)
+        if not ready:
+            raise TimeoutError('tmux control client did not reply')
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise OSError('tmux control client exited')
+        _buf += chunk
+
+def _read_reply(proc):
+    # Skip notifications (%output, %window-add, ...) until our reply begins
+    while not _read_line(proc).startswith(b'%begin'):
+        pass
+    lines = []
+    while True:
+        line = _read_line(proc)
+        if line.startswith(b'%end'):
+            return lines
+        if line.startswith(b'%error'):
+            return None
+        lines.append(line)